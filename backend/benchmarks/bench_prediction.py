@@ -0,0 +1,329 @@
+"""
+Benchmark suite for the power prediction pipeline.
+
+Runs fully offline against the rows in context/spg.xls and writes a JSON
+report so results can be compared across releases:
+
+    cd backend
+    python -m benchmarks.bench_prediction --output bench_prediction.json
+    python -m benchmarks.bench_prediction --backend compiled --quick
+
+Suites: single-row latency, batch throughput (1 / 100 / 10k rows), cold vs
+warm start (cold start runs in a fresh interpreter), concurrent request
+throughput through the FastAPI app using an in-process ASGI client, and
+/energy_by_location throughput against the offline Open-Meteo stand-in
+(benchmarks/open_meteo_stub.py) with and without the weather cache.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+DATA_PATH = os.path.join(BACKEND_DIR, "context", "spg.xls")
+
+
+def _summary(samples):
+    ordered = sorted(samples)
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+    return {
+        "n": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1e3,
+        "p50_ms": percentile(50) * 1e3,
+        "p95_ms": percentile(95) * 1e3,
+        "p99_ms": percentile(99) * 1e3,
+        "min_ms": ordered[0] * 1e3,
+    }
+
+
+@contextlib.contextmanager
+def _quiet():
+    # Keep registry and service log lines out of the JSON report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def load_rows(feature_names, n_rows):
+    import numpy as np
+    import pandas as pd
+
+    data = pd.read_csv(DATA_PATH)[list(feature_names)].to_numpy(dtype=np.float64)
+    repeats = -(-n_rows // len(data))
+    return np.ascontiguousarray(np.tile(data, (repeats, 1))[:n_rows])
+
+
+def bench_single_row(pipeline, rows, iterations):
+    samples = []
+    with _quiet():
+        for i in range(iterations):
+            row = rows[i % len(rows)].reshape(1, -1)
+            started = time.perf_counter()
+            pipeline.predict_batch(row)
+            samples.append(time.perf_counter() - started)
+    return _summary(samples)
+
+
+def bench_batch_throughput(pipeline, rows, sizes, min_seconds):
+    results = {}
+    with _quiet():
+        for size in sizes:
+            batch = rows[:size]
+            pipeline.predict_batch(batch)
+            samples = []
+            deadline = time.perf_counter() + min_seconds
+            while time.perf_counter() < deadline or len(samples) < 3:
+                started = time.perf_counter()
+                pipeline.predict_batch(batch)
+                samples.append(time.perf_counter() - started)
+            summary = _summary(samples)
+            summary["rows_per_second"] = size / statistics.median(samples)
+            results[str(size)] = summary
+    return results
+
+
+COLD_START_SCRIPT = """
+import json, time
+started = time.perf_counter()
+from services.power_pipeline import PredictPipeline
+from services.model_registry import get_artifacts
+import numpy as np
+imported = time.perf_counter()
+pipeline = PredictPipeline()
+artifacts = get_artifacts()
+loaded = time.perf_counter()
+row = np.zeros((1, len(artifacts.feature_names)))
+pipeline.predict_batch(row)
+first = time.perf_counter()
+pipeline.predict_batch(row)
+second = time.perf_counter()
+print("BENCH_RESULT " + json.dumps({
+    "import_seconds": imported - started,
+    "load_seconds": loaded - imported,
+    "first_predict_seconds": first - loaded,
+    "warm_predict_seconds": second - first,
+    "time_to_first_prediction_seconds": first - started,
+}))
+"""
+
+
+def bench_cold_start(runs):
+    samples = []
+    for _ in range(runs):
+        completed = subprocess.run(
+            [sys.executable, "-c", COLD_START_SCRIPT],
+            cwd=BACKEND_DIR,
+            env=os.environ.copy(),
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        line = next(line for line in completed.stdout.splitlines() if line.startswith("BENCH_RESULT "))
+        samples.append(json.loads(line[len("BENCH_RESULT "):]))
+    result = {
+        key.replace("_seconds", "_ms"): statistics.median(sample[key] for sample in samples) * 1e3
+        for key in samples[0]
+    }
+    result["runs"] = runs
+    return result
+
+
+async def _bench_concurrency(app, payloads, concurrency, total_requests, path="/power_prediction"):
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for i in range(total_requests):
+        queue.put_nowait(payloads[i % len(payloads)])
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+
+        async def worker():
+            nonlocal errors
+            while not queue.empty():
+                payload = queue.get_nowait()
+                started = time.perf_counter()
+                response = await client.post(path, json=payload)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        elapsed = time.perf_counter() - started
+
+    summary = _summary(latencies)
+    summary["requests_per_second"] = total_requests / elapsed
+    summary["errors"] = errors
+    return summary
+
+
+def bench_http(rows, feature_names, levels, total_requests, use_cache):
+    with _quiet():
+        import server
+        from services.inference_executor import inference_executor
+
+    payloads = [
+        {"features": dict(zip(feature_names, map(float, row))), "use_cache": use_cache}
+        for row in rows[:1000]
+    ]
+
+    async def run_all():
+        inference_executor.start()
+        results = {}
+        try:
+            # Warm the app once so the first level does not pay lazy costs
+            await _bench_concurrency(server.app, payloads, 1, 5)
+            for concurrency in levels:
+                results[str(concurrency)] = await _bench_concurrency(
+                    server.app, payloads, concurrency, total_requests
+                )
+        finally:
+            inference_executor.shutdown()
+        return results
+
+    with _quiet():
+        return asyncio.run(run_all())
+
+
+# Indian cities plus nearby points, so cached runs see grid-cell hits
+LOCATION_SITES = [
+    (28.61, 77.21), (19.08, 72.88), (12.97, 77.59), (13.08, 80.27), (22.57, 88.36),
+    (17.39, 78.49), (23.02, 72.57), (18.52, 73.86), (26.91, 75.79), (21.17, 72.83),
+]
+
+
+def bench_location(levels, total_requests, use_cache, latency_ms, jitter_ms):
+    with _quiet():
+        import server
+        from benchmarks.open_meteo_stub import stub_transport
+        from services.inference_executor import inference_executor
+        from services.prediction_cache import prediction_cache
+        from services.weather_cache import weather_cache
+        from services.weather_client import weather_client
+
+    payloads = [
+        {"latitude": latitude + offset, "longitude": longitude + offset, "use_cache": use_cache}
+        for latitude, longitude in LOCATION_SITES
+        for offset in (0.0, 0.004, 0.011)
+    ]
+
+    async def run_all():
+        transport = stub_transport(latency_ms=latency_ms, jitter_ms=jitter_ms, seed=0)
+        await weather_client.aclose()
+        weather_client.transport = transport
+        inference_executor.start()
+        results = {}
+        try:
+            for concurrency in levels:
+                weather_cache.clear()
+                prediction_cache.clear()
+                before = dict(transport.app.state.stats)
+                result = await _bench_concurrency(
+                    server.app, payloads, concurrency, total_requests, path="/energy_by_location"
+                )
+                stats = transport.app.state.stats
+                result["upstream_requests"] = stats["requests"] - before["requests"]
+                results[str(concurrency)] = result
+        finally:
+            await weather_client.aclose()
+            weather_client.transport = None
+            inference_executor.shutdown()
+        return results
+
+    with _quiet():
+        return asyncio.run(run_all())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["pickle", "compiled"], default=os.getenv("MODEL_BACKEND", "pickle"))
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--quick", action="store_true", help="Fewer iterations for a smoke run")
+    parser.add_argument("--weather-latency-ms", type=float, default=80.0, help="Stand-in Open-Meteo latency")
+    parser.add_argument("--weather-jitter-ms", type=float, default=20.0, help="Stand-in Open-Meteo jitter")
+    parser.add_argument(
+        "--suites",
+        default="single,batch,cold,http,location",
+        help="Comma-separated subset of single,batch,cold,http,location",
+    )
+    args = parser.parse_args()
+
+    # Must be set before the registry is imported
+    os.environ["MODEL_BACKEND"] = args.backend
+    sys.path.insert(0, BACKEND_DIR)
+    suites = set(args.suites.split(","))
+
+    import numpy as np
+
+    with _quiet():
+        from services.model_registry import get_artifacts
+        from services.power_pipeline import PredictPipeline
+
+        pipeline = PredictPipeline()
+        artifacts = get_artifacts()
+
+    rows = load_rows(artifacts.feature_names, 10_000)
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "backend": args.backend,
+            "model_version": artifacts.version,
+        },
+        "results": {},
+    }
+
+    if "single" in suites:
+        report["results"]["single_row_latency"] = bench_single_row(
+            pipeline, rows, 200 if args.quick else 2000
+        )
+    if "batch" in suites:
+        report["results"]["batch_throughput"] = bench_batch_throughput(
+            pipeline, rows, [1, 100, 10_000], 0.2 if args.quick else 2.0
+        )
+    if "cold" in suites:
+        report["results"]["cold_start"] = bench_cold_start(1 if args.quick else 5)
+    if "http" in suites:
+        levels = [1, 16, 64]
+        total = 200 if args.quick else 2000
+        report["results"]["http_concurrency"] = bench_http(
+            rows, artifacts.feature_names, levels, total, use_cache=False
+        )
+        report["results"]["http_concurrency_cached"] = bench_http(
+            rows[:50], artifacts.feature_names, levels, total, use_cache=True
+        )
+
+    if "location" in suites:
+        levels = [1, 16, 64]
+        total = 100 if args.quick else 1000
+        for key, use_cache in (("location_concurrency", False), ("location_concurrency_cached", True)):
+            report["results"][key] = bench_location(
+                levels, total, use_cache, args.weather_latency_ms, args.weather_jitter_ms
+            )
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file_obj:
+            file_obj.write(output + "\n")
+        print(f"Wrote benchmark report to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+Latency/accuracy report for the truncated-ensemble fast mode.
+
+Sweeps the number of boosting iterations K on a held-out split of
+context/spg.xls and reports error against the measured power, error against
+the full model, and single-row / 10k-row latency for each K:
+
+    cd backend
+    python -m benchmarks.fast_mode_report --output fast_mode_report.json
+    python -m benchmarks.fast_mode_report --backend compiled --iterations 10,20,30,100
+
+The split is a seeded 20% sample. The training split of the shipped model is
+not recorded, so some held-out rows may have been seen in training; compare K
+values against each other rather than reading the errors as a clean test score.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+from benchmarks.bench_prediction import BACKEND_DIR, DATA_PATH, _quiet
+
+TARGET_COLUMN = "generated_power_kw"
+
+
+def _latency(fn, repeats):
+    fn()
+    started = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - started) / repeats * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["pickle", "compiled"], default=os.getenv("MODEL_BACKEND", "pickle"))
+    parser.add_argument("--iterations", default="5,10,20,30,40,50,60,80,100")
+    parser.add_argument("--holdout-fraction", type=float, default=0.2)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the JSON report here as well as printing a table")
+    args = parser.parse_args()
+
+    os.environ["MODEL_BACKEND"] = args.backend
+    sys.path.insert(0, BACKEND_DIR)
+
+    import numpy as np
+    import pandas as pd
+
+    with _quiet():
+        from services.model_registry import get_artifacts
+        from services.power_pipeline import PredictPipeline
+
+        pipeline = PredictPipeline()
+        artifacts = get_artifacts()
+
+    data = pd.read_csv(DATA_PATH)
+    holdout = data.sample(frac=args.holdout_fraction, random_state=args.seed)
+    X = holdout[list(artifacts.feature_names)].to_numpy(dtype=np.float64)
+    y = holdout[TARGET_COLUMN].to_numpy(dtype=np.float64)
+    batch = np.tile(X, (-(-10_000 // len(X)), 1))[:10_000]
+    row = X[:1]
+
+    full = pipeline.predict_batch(X)
+    results = []
+    for k in [int(value) for value in args.iterations.split(",")]:
+        preds = pipeline.predict_batch(X, num_iterations=k)
+        residual = preds - y
+        results.append({
+            "iterations": k,
+            "mae_kw": float(np.mean(np.abs(residual))),
+            "rmse_kw": float(np.sqrt(np.mean(residual ** 2))),
+            "r2": float(1 - np.sum(residual ** 2) / np.sum((y - y.mean()) ** 2)),
+            "mae_vs_full_kw": float(np.mean(np.abs(preds - full))),
+            "single_row_ms": _latency(lambda: pipeline.predict_batch(row, num_iterations=k), 300),
+            "batch_10k_ms": _latency(lambda: pipeline.predict_batch(batch, num_iterations=k), 3),
+        })
+
+    report = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "backend": args.backend,
+            "model_version": artifacts.version,
+            "holdout_rows": len(holdout),
+            "holdout_fraction": args.holdout_fraction,
+            "seed": args.seed,
+        },
+        "results": results,
+    }
+
+    print(f"{'K':>5} {'MAE kW':>9} {'RMSE kW':>9} {'R2':>7} {'MAE vs full':>12} {'1 row ms':>9} {'10k ms':>9}")
+    for result in results:
+        print(
+            f"{result['iterations']:>5} {result['mae_kw']:>9.1f} {result['rmse_kw']:>9.1f} "
+            f"{result['r2']:>7.3f} {result['mae_vs_full_kw']:>12.1f} "
+            f"{result['single_row_ms']:>9.3f} {result['batch_10k_ms']:>9.1f}"
+        )
+    if args.output:
+        with open(args.output, "w") as file_obj:
+            json.dump(report, file_obj, indent=2)
+            file_obj.write("\n")
+        print(f"Wrote fast mode report to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
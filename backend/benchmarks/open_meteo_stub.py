@@ -0,0 +1,298 @@
+"""
+Offline stand-in for the Open-Meteo forecast API.
+
+Serves /v1/forecast (including the comma-separated multi-location form) with
+configurable latency, jitter and error rate, so the location endpoints can
+be load-tested without network access:
+
+    cd backend
+    python -m benchmarks.open_meteo_stub record --location 28.61,77.21 --location 19.08,72.88
+    python -m benchmarks.open_meteo_stub serve --port 8081 --latency-ms 80 --jitter-ms 30 --error-rate 0.01
+    OPEN_METEO_BASE_URL=http://127.0.0.1:8081 uvicorn server:app
+
+In-process, `stub_transport()` returns an httpx transport for
+services.weather_client; the `location` suite of benchmarks.bench_prediction
+uses it.
+
+Payloads are replayed from the JSON fixtures in benchmarks/fixtures/open_meteo
+(written by `record`); the fixture nearest to the requested coordinate is
+served. Without fixtures, payloads are synthesized from the daytime weather
+sequences in context/spg.xls, with night hours interpolated and radiation set
+to zero after dark. Either way the timestamps are shifted so the forecast
+starts today (UTC), and all randomness is seeded so runs are repeatable.
+"""
+
+import argparse
+import asyncio
+import datetime
+import functools
+import glob
+import json
+import os
+import random
+import sys
+
+from benchmarks.bench_prediction import BACKEND_DIR, DATA_PATH
+
+FIXTURE_DIR = os.path.join(BACKEND_DIR, "benchmarks", "fixtures", "open_meteo")
+FORECAST_DAYS = 7
+
+# Open-Meteo hourly variable -> training data column, for synthesized payloads
+SYNTHETIC_VARIABLES = {
+    "temperature_2m": "temperature_2_m_above_gnd",
+    "relative_humidity_2m": "relative_humidity_2_m_above_gnd",
+    "pressure_msl": "mean_sea_level_pressure_MSL",
+    "precipitation": "total_precipitation_sfc",
+    "snowfall": "snowfall_amount_sfc",
+    "cloud_cover": "total_cloud_cover_sfc",
+    "cloud_cover_high": "high_cloud_cover_high_cld_lay",
+    "cloud_cover_mid": "medium_cloud_cover_mid_cld_lay",
+    "cloud_cover_low": "low_cloud_cover_low_cld_lay",
+    "shortwave_radiation": "shortwave_radiation_backwards_sfc",
+    "wind_speed_10m": "wind_speed_10_m_above_gnd",
+    "wind_direction_10m": "wind_direction_10_m_above_gnd",
+    "wind_gusts_10m": "wind_gust_10_m_above_gnd",
+}
+# Local solar hour of the first daytime row of each day in spg.xls
+FIRST_DAYLIGHT_HOUR = 8
+# WMO: sunshine is direct irradiance above 120 W/m2; shortwave is a proxy here
+SUNSHINE_THRESHOLD = 120
+
+
+def _today():
+    return datetime.datetime.now(datetime.timezone.utc).date()
+
+
+@functools.lru_cache(maxsize=1)
+def _training_days():
+    """Splits spg.xls into daytime sequences; a new day starts where the azimuth drops."""
+    import numpy as np
+    import pandas as pd
+
+    data = pd.read_csv(DATA_PATH)
+    azimuth = data["azimuth"].to_numpy()
+    starts = np.flatnonzero(np.diff(azimuth) < -50) + 1
+    bounds = np.concatenate([[0], starts, [len(data)]])
+    columns = list(SYNTHETIC_VARIABLES.values())
+    return [
+        data[columns].iloc[start:end].to_numpy(dtype=np.float64)
+        for start, end in zip(bounds[:-1], bounds[1:])
+        if end - start <= 24 - FIRST_DAYLIGHT_HOUR
+    ]
+
+
+def synthetic_payload(latitude, longitude, start=None):
+    """Builds a FORECAST_DAYS Open-Meteo style payload from consecutive training days."""
+    import numpy as np
+
+    start = start or _today()
+    days = _training_days()
+    # Different coordinates get different (but repeatable) weather
+    first = random.Random(f"{latitude:.2f},{longitude:.2f}").randrange(len(days) - FORECAST_DAYS - 2)
+
+    # Local solar time series with one spare day either side for the UTC shift
+    n_local = (FORECAST_DAYS + 2) * 24
+    local = np.full((n_local, len(SYNTHETIC_VARIABLES)), np.nan)
+    for day in range(FORECAST_DAYS + 2):
+        rows = days[first + day]
+        offset = day * 24 + FIRST_DAYLIGHT_HOUR
+        local[offset:offset + len(rows)] = rows
+    radiation = list(SYNTHETIC_VARIABLES).index("shortwave_radiation")
+    local[np.isnan(local[:, radiation]), radiation] = 0
+    hours = np.arange(n_local)
+    for column in range(local.shape[1]):
+        known = ~np.isnan(local[:, column])
+        local[:, column] = np.interp(hours, hours[known], local[known, column])
+
+    utc_offset = int(round(longitude / 15))
+    hourly_values = local[24 + utc_offset:24 + utc_offset + FORECAST_DAYS * 24]
+
+    base = datetime.datetime.combine(start, datetime.time(), tzinfo=datetime.timezone.utc)
+    times = [(base + datetime.timedelta(hours=h)).strftime("%Y-%m-%dT%H:%M") for h in range(FORECAST_DAYS * 24)]
+    hourly = {"time": times}
+    for column, variable in enumerate(SYNTHETIC_VARIABLES):
+        hourly[variable] = [round(float(value), 2) for value in hourly_values[:, column]]
+
+    sunshine = (hourly_values[:, radiation] > SUNSHINE_THRESHOLD).reshape(FORECAST_DAYS, 24).sum(axis=1) * 3600
+    return {
+        "latitude": latitude,
+        "longitude": longitude,
+        "utc_offset_seconds": 0,
+        "timezone": "GMT",
+        "hourly": hourly,
+        "daily": {
+            "time": times[::24],
+            "sunshine_duration": [float(value) for value in sunshine],
+        },
+    }
+
+
+def _shift_payload(payload, start):
+    """Moves every timestamp in a recorded payload so its first forecast day is `start`."""
+    first = datetime.date.fromisoformat(payload["hourly"]["time"][0][:10])
+    delta = datetime.timedelta(days=(start - first).days)
+
+    def shift(value):
+        if len(value) == 10:
+            return (datetime.date.fromisoformat(value) + delta).isoformat()
+        return (datetime.datetime.fromisoformat(value) + delta).strftime("%Y-%m-%dT%H:%M")
+
+    payload = json.loads(json.dumps(payload))
+    for section in ("hourly", "daily"):
+        if "time" in payload.get(section, {}):
+            payload[section]["time"] = [shift(value) for value in payload[section]["time"]]
+    return payload
+
+
+def _with_current(payload):
+    """Fills the `current` block from the forecast hour containing the present time."""
+    now = datetime.datetime.now(datetime.timezone.utc)
+    hour = now.strftime("%Y-%m-%dT%H:00")
+    hourly = payload["hourly"]
+    index = hourly["time"].index(hour) if hour in hourly["time"] else 0
+    payload = dict(payload)
+    payload["current"] = {
+        "time": now.strftime("%Y-%m-%dT%H:") + f"{now.minute - now.minute % 15:02d}",
+        "interval": 900,
+        **{
+            variable: hourly[variable][index]
+            for variable in ("temperature_2m", "wind_speed_10m", "wind_direction_10m")
+            if variable in hourly
+        },
+    }
+    return payload
+
+
+def load_fixtures(directory=FIXTURE_DIR):
+    fixtures = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path) as file_obj:
+            fixtures.append(json.load(file_obj))
+    return fixtures
+
+
+class PayloadSource:
+    def __init__(self, fixtures=None):
+        self.fixtures = load_fixtures() if fixtures is None else fixtures
+
+    def payload(self, latitude, longitude, start):
+        return _with_current(self._forecast(latitude, longitude, start))
+
+    @functools.lru_cache(maxsize=4096)
+    def _forecast(self, latitude, longitude, start):
+        if self.fixtures:
+            fixture = min(
+                self.fixtures,
+                key=lambda item: (item["latitude"] - latitude) ** 2 + (item["longitude"] - longitude) ** 2,
+            )
+            payload = _shift_payload(fixture, start)
+            payload["latitude"], payload["longitude"] = latitude, longitude
+        else:
+            payload = synthetic_payload(latitude, longitude, start)
+        return payload
+
+
+def create_app(fixtures=None, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0, seed=0):
+    """
+    Returns an ASGI app serving /v1/forecast. Every request waits
+    `latency_ms` +/- `jitter_ms` and fails with a 503 with probability
+    `error_rate`. Request counts are kept in `app.state.stats`.
+    """
+    from fastapi import FastAPI
+    from fastapi.responses import JSONResponse
+
+    app = FastAPI(title="Open-Meteo stand-in")
+    source = PayloadSource(fixtures)
+    rng = random.Random(seed)
+    app.state.stats = {"requests": 0, "locations": 0, "errors": 0}
+
+    @app.get("/v1/forecast")
+    async def forecast(latitude: str, longitude: str):
+        stats = app.state.stats
+        stats["requests"] += 1
+        delay = max(0.0, latency_ms + rng.uniform(-jitter_ms, jitter_ms)) / 1000
+        failed = rng.random() < error_rate
+        if delay:
+            await asyncio.sleep(delay)
+        if failed:
+            stats["errors"] += 1
+            return JSONResponse({"error": True, "reason": "Injected stand-in failure"}, status_code=503)
+
+        coordinates = list(zip(
+            (round(float(value), 4) for value in latitude.split(",")),
+            (round(float(value), 4) for value in longitude.split(",")),
+        ))
+        stats["locations"] += len(coordinates)
+        start = _today()
+        payloads = [source.payload(lat, lon, start) for lat, lon in coordinates]
+        return JSONResponse(payloads if len(payloads) > 1 else payloads[0])
+
+    return app
+
+
+def stub_transport(**kwargs):
+    """httpx transport that routes every request to an in-process stand-in app."""
+    import httpx
+
+    app = create_app(**kwargs)
+    transport = httpx.ASGITransport(app=app)
+    transport.app = app
+    return transport
+
+
+def record(locations, directory=FIXTURE_DIR):
+    import httpx
+
+    from services.weather_service import FORECAST_QUERY
+
+    os.makedirs(directory, exist_ok=True)
+    with httpx.Client(timeout=30) as client:
+        for latitude, longitude in locations:
+            url = f"https://api.open-meteo.com/v1/forecast?latitude={latitude}&longitude={longitude}" + FORECAST_QUERY
+            resp = client.get(url)
+            resp.raise_for_status()
+            path = os.path.join(directory, f"forecast_{latitude}_{longitude}.json")
+            with open(path, "w") as file_obj:
+                json.dump(resp.json(), file_obj)
+            print(f"Recorded {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = commands.add_parser("record", help="Save real Open-Meteo responses as fixtures")
+    record_parser.add_argument("--location", action="append", required=True, help="lat,lon; repeat for more")
+    record_parser.add_argument("--directory", default=FIXTURE_DIR)
+
+    serve_parser = commands.add_parser("serve", help="Run the stand-in as an HTTP server")
+    serve_parser.add_argument("--host", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8081)
+    serve_parser.add_argument("--latency-ms", type=float, default=0.0)
+    serve_parser.add_argument("--jitter-ms", type=float, default=0.0)
+    serve_parser.add_argument("--error-rate", type=float, default=0.0)
+    serve_parser.add_argument("--seed", type=int, default=0)
+    serve_parser.add_argument("--directory", default=FIXTURE_DIR)
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    if args.command == "record":
+        record(
+            [tuple(float(value) for value in location.split(",")) for location in args.location],
+            args.directory,
+        )
+    else:
+        import uvicorn
+
+        app = create_app(
+            fixtures=load_fixtures(args.directory),
+            latency_ms=args.latency_ms,
+            jitter_ms=args.jitter_ms,
+            error_rate=args.error_rate,
+            seed=args.seed,
+        )
+        uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
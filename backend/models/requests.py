@@ -70,7 +70,43 @@ class PowerPredictionFeatures(BaseModel):
 
 class PowerPredictionRequest(BaseModel):
     features: PowerPredictionFeatures
+    use_cache: bool = True
+    # Evaluate only the first FAST_MODE_ITERATIONS boosting iterations; None uses the endpoint default
+    fast: Optional[bool] = None
+
+class BatchPowerPredictionRequest(BaseModel):
+    features: List[PowerPredictionFeatures] = Field(..., min_length=1)
+    use_cache: bool = True
+    fast: Optional[bool] = None
 
 class LocationRequest(BaseModel):
     latitude: float
-    longitude: float
\ No newline at end of file
+    longitude: float
+    # Applies to both the grid-cell weather cache and the prediction cache
+    use_cache: bool = True
+    fast: Optional[bool] = None
+    # Panel orientation for angle_of_incidence; None uses SOLAR_PANEL_TILT / SOLAR_PANEL_AZIMUTH
+    panel_tilt: Optional[float] = Field(default=None, ge=0, le=90)
+    panel_azimuth: Optional[float] = Field(default=None, ge=0, lt=360)
+
+class SiteLocation(BaseModel):
+    latitude: float
+    longitude: float
+    panel_tilt: Optional[float] = Field(default=None, ge=0, le=90)
+    panel_azimuth: Optional[float] = Field(default=None, ge=0, lt=360)
+
+class BatchLocationRequest(BaseModel):
+    locations: List[SiteLocation] = Field(..., min_length=1, max_length=1000)
+    use_cache: bool = True
+    fast: Optional[bool] = None
+
+class AnnualYieldRequest(BaseModel):
+    latitude: float
+    longitude: float
+    # Peak (DC) size of the system to simulate, in kWp
+    system_capacity_kw: float = Field(..., gt=0)
+    panel_tilt: Optional[float] = Field(default=None, ge=0, le=90)
+    panel_azimuth: Optional[float] = Field(default=None, ge=0, lt=360)
+    # Applies to the annual yield cache
+    use_cache: bool = True
+    fast: Optional[bool] = None
\ No newline at end of file
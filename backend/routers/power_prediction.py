@@ -1,200 +1,391 @@
+import asyncio
+from dataclasses import replace
+import logging
+import math
+import os
+
 from fastapi import APIRouter, HTTPException
-import pandas as pd
 import httpx
+import numpy as np
 from models.requests import (
     PowerPredictionRequest,
-    PowerPredictionFeatures,
+    BatchPowerPredictionRequest,
     LocationRequest,
+    BatchLocationRequest,
+    AnnualYieldRequest,
+)
+
+from services.annual_yield import annual_yield as simulate_annual_yield
+from services.circuit_breaker import CircuitOpenError
+from services.climatology import climatology
+from services.forecast_grid import forecast_grid
+from services.inference_executor import InferenceQueueFull
+from services.hourly_forecast import (
+    current_hour_index,
+    daily_energy_kwh,
+    hourly_feature_matrix,
+    hourly_power,
+    site_feature_matrices,
 )
+from services.prediction_engine import engine, resolve_iterations
+from services.weather_service import fetch_forecast, fetch_forecasts, is_upstream_failure
 
-from services.power_pipeline import PredictPipeline
+logger = logging.getLogger(__name__)
+
+# Retry-After (s) on 503s that carry no better hint: a full inference queue
+# or an upstream weather failure while the circuit breaker is still closed
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "5"))
 
 router = APIRouter()
 
 
 @router.post("/power_prediction")
 async def power_prediction(request: PowerPredictionRequest):
+    try:
+        pred = await engine.predict_one(
+            request.features,
+            request.use_cache,
+            resolve_iterations(request.fast, "/power_prediction"),
+        )
+        return {
+            "predicted_power": pred,
+        }
+
+    except InferenceQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+        )
+
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e),
+        )
+
+
+@router.post("/power_prediction/batch")
+async def power_prediction_batch(request: BatchPowerPredictionRequest):
     """
-    Accepts weather and solar features and predicts the power output using a pipeline.
+    Predicts power for many feature rows with a single vectorized pipeline pass.
     """
     try:
-        print("Parsed request:", request)
-        df = pd.DataFrame([request.features.dict()])
-        print("DataFrame created:", df)
-        pipeline = PredictPipeline()
-        print("Pipeline initialized")
-        pred = pipeline.predict(df)
-        print("Prediction made:", pred)
+        preds = await engine.predict_many(
+            request.features,
+            request.use_cache,
+            resolve_iterations(request.fast, "/power_prediction/batch"),
+        )
         return {
-            "predicted_power": (
-                pred[0] if isinstance(pred, (list, pd.Series, pd.DataFrame)) else pred
-            ),
+            "predicted_power": preds.tolist(),
         }
 
-    except HTTPException as e:
-        raise e
+    except InferenceQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+        )
 
     except Exception as e:
-        print(f"Error in power_prediction endpoint: {e}")
         raise HTTPException(
             status_code=500,
-            detail=f"An internal error occurred during power prediction: {str(e)}",
+            detail=str(e),
+        )
+
+
+def _grid_lookup(site, use_cache, num_iterations):
+    # The precomputed grid is a cache too, so use_cache=false skips it
+    if not (use_cache and forecast_grid.enabled):
+        return None
+    grid_forecast = forecast_grid.lookup(
+        site.latitude,
+        site.longitude,
+        site.panel_tilt,
+        site.panel_azimuth,
+    )
+    if grid_forecast is not None and num_iterations is not None:
+        # The grid was scored with the full ensemble; fast mode re-scores the
+        # interpolated features with the truncated one
+        grid_forecast = replace(grid_forecast, power=None)
+    return grid_forecast
+
+
+def _unavailable(detail, retry_after=RETRY_AFTER_SECONDS):
+    # A 503 with Retry-After tells clients and load balancers to back off
+    # instead of retrying straight away
+    return HTTPException(
+        status_code=503,
+        detail=detail,
+        headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+    )
+
+
+def _weather_error(e):
+    """Maps a failed Open-Meteo request to a 503 when Open-Meteo is at fault, else a 500."""
+    if not isinstance(e, httpx.HTTPStatusError):
+        logger.error("Weather API request failed: %s - %s", type(e).__name__, e)
+        if is_upstream_failure(e):
+            return _unavailable(f"Weather service unavailable: {type(e).__name__}")
+        return HTTPException(
+            status_code=500,
+            detail=f"Error fetching weather data: {type(e).__name__}",
         )
 
+    status_code = e.response.status_code
+    logger.error("HTTP Error from weather API: %s - %s", status_code, e.response.text)
+    if is_upstream_failure(e):
+        # Pass on Open-Meteo's own back-off hint when it rate limits us
+        header = e.response.headers.get("Retry-After", "")
+        retry_after = int(header) if header.isdigit() else RETRY_AFTER_SECONDS
+        return _unavailable(f"Weather service unavailable: upstream returned {status_code}", retry_after)
+    return HTTPException(
+        status_code=500,
+        detail=f"Error fetching weather data: {status_code}",
+    )
+
+
+def _site_features(data, site):
+    times, features = hourly_feature_matrix(
+        data,
+        engine.feature_names,
+        site.latitude,
+        site.longitude,
+        site.panel_tilt,
+        site.panel_azimuth,
+    )
+    if not times:
+        raise ValueError("Weather forecast contained no hourly data")
+    return times, features
+
+
+def _site_energy(data, times, features, preds):
+    power = hourly_power(preds, features, engine.feature_names)
+    days, energy_kwh = daily_energy_kwh(times, power)
+    pred = float(preds[current_hour_index(data, times)])
+
+    daily_data = data.get("daily", {})
+    sunshine_duration_seconds = daily_data.get(
+        "sunshine_duration",
+        [
+            None,
+        ],
+    )[0]
+
+    sunshine_duration_hours = None
+    if sunshine_duration_seconds is not None:
+        sunshine_duration_hours = sunshine_duration_seconds / 3600
+
+    return {
+        "predicted_power": pred,
+        "sunshine_duration_hours": sunshine_duration_hours,
+        "energy_generated": (
+            pred * sunshine_duration_hours / 2.5
+            if sunshine_duration_hours
+            else pred * 3
+        ),
+        "hourly": {
+            "time": times,
+            "predicted_power": power.tolist(),
+        },
+        "daily": {
+            "date": days,
+            "energy_kwh": energy_kwh.tolist(),
+        },
+    }
+
 
 @router.post("/energy_by_location")
 async def energy_by_location(request: LocationRequest):
     """
-    Fetches weather data for given latitude and longitude, then predicts power output.
+    Fetches the hourly forecast for the given latitude and longitude, predicts
+    power for every forecast hour and integrates it into daily energy (kWh).
+
+    `predicted_power`, `sunshine_duration_hours` and `energy_generated` keep
+    their previous meaning: the raw prediction for the current hour and the
+    sunshine-based estimate derived from it.
+
+    When the precomputed forecast grid is enabled and covers the location, it
+    is served from the grid and `forecast_source` is "grid"; otherwise the
+    forecast is fetched live.
     """
     try:
+        await engine.ready()
+        num_iterations = resolve_iterations(request.fast, "/energy_by_location")
+        grid_forecast = _grid_lookup(request, request.use_cache, num_iterations)
+        if grid_forecast is not None:
+            data, times, features, preds = (
+                grid_forecast.data,
+                grid_forecast.times,
+                grid_forecast.features,
+                grid_forecast.power,
+            )
+        else:
+            data = await fetch_forecast(
+                request.latitude,
+                request.longitude,
+                request.use_cache,
+            )
+            times, features = _site_features(data, request)
+            preds = None
 
-        url = (
-            f"https://api.open-meteo.com/v1/forecast?latitude={request.latitude}&longitude={request.longitude}"
-            "&hourly=temperature_2m,relative_humidity_2m,pressure_msl,precipitation,snowfall,"
-            "cloud_cover,cloud_cover_high,cloud_cover_mid,cloud_cover_low,shortwave_radiation,"
-            "wind_speed_10m,wind_direction_10m,wind_gusts_10m"
-            "&current=temperature_2m,wind_speed_10m,wind_direction_10m&timezone=UTC"
-        )
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            data = resp.json()
-
-        features = {}
-        current_data = data.get("current", {})
-        features["temperature_2_m_above_gnd"] = current_data.get(
-            "temperature_2m",
-        )
-        features["wind_speed_10_m_above_gnd"] = current_data.get(
-            "wind_speed_10m",
-        )
-        features["wind_direction_10_m_above_gnd"] = current_data.get(
-            "wind_direction_10m"
-        )
-
-        hourly = data.get(
-            "hourly",
-            {},
-        )
-
-        features["relative_humidity_2_m_above_gnd"] = hourly.get(
-            "relative_humidity_2m",
-            [
-                None,
-            ],
-        )[0]
-        features["mean_sea_level_pressure_MSL"] = hourly.get(
-            "pressure_msl",
-            [
-                None,
-            ],
-        )[0]
-        features["total_precipitation_sfc"] = hourly.get(
-            "precipitation",
-            [
-                None,
-            ],
-        )[0]
-        features["snowfall_amount_sfc"] = hourly.get(
-            "snowfall",
-            [
-                None,
-            ],
-        )[0]
-        features["total_cloud_cover_sfc"] = hourly.get(
-            "cloud_cover",
-            [
-                None,
-            ],
-        )[0]
-        features["high_cloud_cover_high_cld_lay"] = hourly.get(
-            "cloud_cover_high",
-            [
-                None,
-            ],
-        )[0]
-        features["medium_cloud_cover_mid_cld_lay"] = hourly.get(
-            "cloud_cover_mid",
-            [
-                None,
-            ],
-        )[0]
-        features["low_cloud_cover_low_cld_lay"] = hourly.get(
-            "cloud_cover_low",
-            [
-                None,
-            ],
-        )[0]
-        features["shortwave_radiation_backwards_sfc"] = hourly.get(
-            "shortwave_radiation",
-            [
-                None,
-            ],
-        )[0]
-        features["wind_gust_10_m_above_gnd"] = hourly.get(
-            "wind_gusts_10m",
-            [
-                None,
-            ],
-        )[0]
-
-        for key, value in features.items():
-            if value is None:
-                print(f"Warning: Missing weather data for {key}, using default 0.")
-                features[key] = 0
-
-        features["wind_speed_80_m_above_gnd"] = features.get(
-            "wind_speed_10_m_above_gnd",
-            0,
-        )
-        features["wind_direction_80_m_above_gnd"] = features.get(
-            "wind_direction_10_m_above_gnd",
-            0,
-        )
-        features["wind_speed_900_mb"] = features.get(
-            "wind_speed_10_m_above_gnd",
-            0,
-        )
-        features["wind_direction_900_mb"] = features.get(
-            "wind_direction_10_m_above_gnd",
-            0,
-        )
-
-        features_model = PowerPredictionFeatures(**features)
-        df = pd.DataFrame([features_model.dict()])
-        pipeline = PredictPipeline()
-        pred = pipeline.predict(df)
-
-        daily_data = data.get("daily", {})
-        sunshine_duration_seconds = daily_data.get("sunshine_duration", [None])[0]
-        sunshine_duration_hours = None
-        if sunshine_duration_seconds is not None:
-            sunshine_duration_hours = sunshine_duration_seconds / 3600
-
+        if preds is None:
+            # Every forecast hour is scored in one batched prediction. The
+            # hourly rows bypass the prediction cache: a single forecast would
+            # evict up to 168 cached /power_prediction entries.
+            preds = await engine.predict_matrix(
+                features,
+                use_cache=False,
+                num_iterations=num_iterations,
+            )
         return {
-            "predicted_power": pred,
-            "sunshine_duration_hours": sunshine_duration_hours,
-            "energy_generated": (
-                pred * sunshine_duration_hours / 2.5
-                if sunshine_duration_hours
-                else pred * 3
-            ),
+            **_site_energy(data, times, features, preds),
+            "forecast_source": "live" if grid_forecast is None else "grid",
         }
 
-    except httpx.HTTPStatusError as e:
+    except InferenceQueueFull as e:
+        raise _unavailable(str(e))
 
-        print(
-            f"HTTP Error from weather API: {e.response.status_code} - {e.response.text}"
-        )
+    except CircuitOpenError as e:
+        raise _unavailable(str(e), e.retry_after)
+
+    except httpx.HTTPError as e:
+        raise _weather_error(e)
+
+    except Exception as e:
+        logger.exception("Error in energy_by_location: %s - %s", type(e).__name__, e)
         raise HTTPException(
             status_code=500,
-            detail=f"Error fetching weather data: {e.response.status_code}",
+            detail=f"Error fetching weather data or predicting power: {e}",
+        )
+
+
+@router.post("/energy_by_location/batch")
+async def energy_by_location_batch(request: BatchLocationRequest):
+    """
+    Energy forecast for many sites at once. Weather is fetched with
+    multi-location Open-Meteo requests and all hours of all sites are scored
+    in a single batched prediction. Each entry of `sites` has the same fields
+    as the /energy_by_location response plus the site coordinates.
+    """
+    try:
+        await engine.ready()
+        num_iterations = resolve_iterations(request.fast, "/energy_by_location/batch")
+        grid_forecasts = [_grid_lookup(site, request.use_cache, num_iterations) for site in request.locations]
+        live_sites = [
+            site
+            for site, grid_forecast in zip(request.locations, grid_forecasts)
+            if grid_forecast is None
+        ]
+        forecasts = await fetch_forecasts(
+            [(site.latitude, site.longitude) for site in live_sites],
+            request.use_cache,
+        )
+        # Up to 1000 sites x 168 hours: built in one vectorized pass, in a
+        # worker thread so other requests keep being served meanwhile
+        site_features = await asyncio.to_thread(
+            site_feature_matrices,
+            forecasts,
+            engine.feature_names,
+            [(site.latitude, site.longitude, site.panel_tilt, site.panel_azimuth) for site in live_sites],
         )
+        live = iter(zip(forecasts, site_features))
+
+        # [data, times, features, preds, source] per site; preds is None until scored
+        entries = []
+        for site, grid_forecast in zip(request.locations, grid_forecasts):
+            if grid_forecast is not None:
+                entries.append([grid_forecast.data, grid_forecast.times, grid_forecast.features, grid_forecast.power, "grid"])
+            else:
+                data, (times, features) = next(live)
+                if not times:
+                    raise ValueError("Weather forecast contained no hourly data")
+                entries.append([data, times, features, None, "live"])
+
+        # All hours of all sites that still need scoring go through one
+        # prediction, bypassing the prediction cache like energy_by_location
+        unscored = [entry for entry in entries if entry[3] is None]
+        if unscored:
+            preds = await engine.predict_matrix(
+                np.vstack([entry[2] for entry in unscored]),
+                use_cache=False,
+                num_iterations=num_iterations,
+            )
+            offsets = np.cumsum([0] + [len(entry[1]) for entry in unscored])
+            for entry, start, end in zip(unscored, offsets[:-1], offsets[1:]):
+                entry[3] = preds[start:end]
+
+        sites = []
+        for site, (data, times, features, preds, source) in zip(request.locations, entries):
+            sites.append({
+                "latitude": site.latitude,
+                "longitude": site.longitude,
+                **_site_energy(data, times, features, preds),
+                "forecast_source": source,
+            })
+        return {
+            "sites": sites,
+        }
+
+    except InferenceQueueFull as e:
+        raise _unavailable(str(e))
+
+    except CircuitOpenError as e:
+        raise _unavailable(str(e), e.retry_after)
+
+    except httpx.HTTPError as e:
+        raise _weather_error(e)
 
     except Exception as e:
-        print(f"Error in energy_by_location: {type(e).__name__} - {e}")
+        logger.exception("Error in energy_by_location_batch: %s - %s", type(e).__name__, e)
         raise HTTPException(
             status_code=500,
             detail=f"Error fetching weather data or predicting power: {e}",
         )
+
+
+@router.post("/annual_yield")
+async def annual_yield(request: AnnualYieldRequest):
+    """
+    Annual and monthly energy (kWh) of a system of `system_capacity_kw` kWp
+    at a site, simulated hour by hour over a typical year from the local
+    climatology archive (CLIMATOLOGY_DIR), with all 8760 hours scored in one
+    batched prediction.
+    """
+    if not climatology.enabled:
+        raise HTTPException(
+            status_code=503,
+            detail="Climatology archive is not configured",
+        )
+    try:
+        result = await simulate_annual_yield(
+            request.latitude,
+            request.longitude,
+            request.system_capacity_kw,
+            request.panel_tilt,
+            request.panel_azimuth,
+            request.use_cache,
+            resolve_iterations(request.fast, "/annual_yield"),
+        )
+
+    except InferenceQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+        )
+
+    except Exception as e:
+        logger.exception("Error in annual_yield: %s - %s", type(e).__name__, e)
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error simulating annual yield: {e}",
+        )
+
+    if result is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"No climatology data within {climatology.max_distance} deg of the location",
+        )
+    return {
+        "latitude": request.latitude,
+        "longitude": request.longitude,
+        **result,
+    }
@@ -1,16 +1,20 @@
-from fastapi import (
-    FastAPI,
-    HTTPException,
-)
+import asyncio
+import logging
+import os
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from services.power_pipeline import PredictPipeline
-from models.requests import (
-    PowerPredictionRequest,
-    LocationRequest,
-    PowerPredictionFeatures,
-)
-import pandas as pd
-import httpx
+from fastapi.responses import JSONResponse, PlainTextResponse
+from services.metrics import render_prometheus
+from services.inference_executor import inference_executor
+from services.model_registry import get_artifacts
+from services.prediction_engine import engine
+from services.forecast_grid import forecast_grid
+from services.climatology import climatology
+from services.weather_client import weather_client
+from services.weather_service import warm_connection as warm_weather_connection
+from services.warmup import WarmupState, run_warmup
+from services import chat_service, recommendation_service
 
 from routers import (
     scrape,
@@ -19,10 +23,35 @@ from routers import (
     power_prediction,
 )
 
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    inference_executor.start()
+    weather_client.start()
+    # Warm up in the background so /check answers immediately while /ready
+    # keeps the load balancer away until the worker is warm.
+    warmup_task = asyncio.create_task(run_warmup(warmup_state, WARMUP_STEPS))
+    grid_task = None
+    if forecast_grid.enabled:
+        grid_task = asyncio.create_task(forecast_grid.run_scheduler())
+    yield
+    warmup_task.cancel()
+    if grid_task is not None:
+        grid_task.cancel()
+    await weather_client.aclose()
+    inference_executor.shutdown()
+
+
 app = FastAPI(
     title="Solar Helper Backend",
     description="FastAPI backend for Solar Helper.",
     version="1.1.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -51,209 +80,63 @@ app.include_router(
         "Recommendation",
     ],
 )
-# app.include_router(power_prediction.router, tags=["Power Prediction"])
-
-
-@app.get("/")
-async def root():
-    return {
-        "message": "Solar Helper Backend is running",
-    }
-
-
-@app.get("/check")
-async def check():
-    return {
-        "status": "ok",
-    }
-
-
-@app.post(
-    "/power_prediction",
+app.include_router(
+    power_prediction.router,
     tags=[
         "Power Prediction",
     ],
 )
-async def power_prediction(request: PowerPredictionRequest):
-    try:
-        print("Parsed request:", request)
-        df = pd.DataFrame(
-            [
-                request.features.dict(),
-            ],
-        )
-        print("DataFrame created:", df)
-        pipeline = PredictPipeline()
-        print("Pipeline initialized")
-        pred = pipeline.predict(df)
-        print("Prediction made:", pred)
-        return {
-            "predicted_power": pred,
-        }
-
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=str(e),
-        )
-
-
-@app.post("/energy_by_location")
-async def energy_by_location(request: LocationRequest):
-    """
-    Fetches weather data for given latitude and longitude, then predicts power output.
-    Also fetches daily sunshine duration.
-    """
-    try:
-
-        url = (
-            f"https://api.open-meteo.com/v1/forecast?latitude={request.latitude}&longitude={request.longitude}"
-            "&hourly=temperature_2m,relative_humidity_2m,pressure_msl,precipitation,snowfall,"
-            "cloud_cover,cloud_cover_high,cloud_cover_mid,cloud_cover_low,shortwave_radiation,"
-            "wind_speed_10m,wind_direction_10m,wind_gusts_10m"
-            "&current=temperature_2m,wind_speed_10m,wind_direction_10m"
-            "&daily=sunshine_duration&timezone=UTC"
-        )
-        async with httpx.AsyncClient() as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            data = resp.json()
-
-        features = {}
-        current_data = data.get("current", {})
-        features["temperature_2_m_above_gnd"] = current_data.get(
-            "temperature_2m",
-        )
-        features["wind_speed_10_m_above_gnd"] = current_data.get(
-            "wind_speed_10m",
-        )
-        features["wind_direction_10_m_above_gnd"] = current_data.get(
-            "wind_direction_10m",
-        )
-
-        hourly = data.get("hourly", {})
-
-        features["relative_humidity_2_m_above_gnd"] = hourly.get(
-            "relative_humidity_2m",
-            [None],
-        )[0]
-
-        features["mean_sea_level_pressure_MSL"] = hourly.get(
-            "pressure_msl",
-            [None],
-        )[0]
-
-        features["total_precipitation_sfc"] = hourly.get(
-            "precipitation",
-            [None],
-        )[0]
-
-        features["snowfall_amount_sfc"] = hourly.get(
-            "snowfall",
-            [None],
-        )[0]
-
-        features["total_cloud_cover_sfc"] = hourly.get(
-            "cloud_cover",
-            [None],
-        )[0]
 
-        features["high_cloud_cover_high_cld_lay"] = hourly.get(
-            "cloud_cover_high",
-            [None],
-        )[0]
 
-        features["medium_cloud_cover_mid_cld_lay"] = hourly.get(
-            "cloud_cover_mid",
-            [None],
-        )[0]
+warmup_state = WarmupState()
 
-        features["low_cloud_cover_low_cld_lay"] = hourly.get(
-            "cloud_cover_low",
-            [None],
-        )[0]
 
-        features["shortwave_radiation_backwards_sfc"] = hourly.get(
-            "shortwave_radiation",
-            [None],
-        )[0]
+def warm_chat_vectorstore():
+    if chat_service.init_retriever() is None:
+        raise RuntimeError("Chat RAG retriever could not be initialized")
 
-        features["wind_gust_10_m_above_gnd"] = hourly.get(
-            "wind_gusts_10m",
-            [None],
-        )[0]
 
-        for key, value in features.items():
-            if value is None:
-                print(f"Warning: Missing weather data for {key}, using default 0.")
-                features[key] = 0
+def warm_recommendation_vectorstore():
+    if recommendation_service.init_retriever() is None:
+        raise RuntimeError("Recommendation RAG retriever could not be initialized")
 
-        features["wind_speed_80_m_above_gnd"] = features.get(
-            "wind_speed_10_m_above_gnd",
-            0,
-        )
 
-        features["wind_direction_80_m_above_gnd"] = features.get(
-            "wind_direction_10_m_above_gnd",
-            0,
-        )
+# (name, fn, required): optional components are reported but do not block /ready
+WARMUP_STEPS = [
+    ("model", get_artifacts, True),
+    ("prediction", engine.warm, True),
+    ("weather_client", warm_weather_connection, False),
+    *([("climatology", climatology.load, False)] if climatology.enabled else []),
+    ("chat_vectorstore", warm_chat_vectorstore, False),
+    ("recommendation_vectorstore", warm_recommendation_vectorstore, False),
+]
 
-        features["wind_speed_900_mb"] = features.get(
-            "wind_speed_10_m_above_gnd",
-            0,
-        )
 
-        features["wind_direction_900_mb"] = features.get(
-            "wind_direction_10_m_above_gnd",
-            0,
-        )
+@app.get("/")
+async def root():
+    return {
+        "message": "Solar Helper Backend is running",
+    }
 
-        features_model = PowerPredictionFeatures(**features)
-        df = pd.DataFrame(
-            [
-                features_model.dict(),
-            ],
-        )
-        pipeline = PredictPipeline()
-        pred = pipeline.predict(df)
 
-        daily_data = data.get("daily", {})
-        sunshine_duration_seconds = daily_data.get(
-            "sunshine_duration",
-            [
-                None,
-            ],
-        )[0]
+@app.get("/check")
+async def check():
+    return {
+        "status": "ok",
+    }
 
-        sunshine_duration_hours = None
-        if sunshine_duration_seconds is not None:
-            sunshine_duration_hours = sunshine_duration_seconds / 3600
 
-        return {
-            "predicted_power": pred,
-            "sunshine_duration_hours": sunshine_duration_hours,
-            "energy_generated": (
-                pred * sunshine_duration_hours / 2.5
-                if sunshine_duration_hours
-                else pred * 3
-            ),
-        }
+@app.get("/ready")
+async def ready():
+    return JSONResponse(
+        status_code=200 if warmup_state.ready else 503,
+        content=warmup_state.snapshot(),
+    )
 
-    except httpx.HTTPStatusError as e:
-        print(
-            f"HTTP Error from weather API: {e.response.status_code} - {e.response.text}"
-        )
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error fetching weather data: {e.response.status_code}",
-        )
 
-    except Exception as e:
-        print(f"Error in energy_by_location: {type(e).__name__} - {e}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"Error fetching weather data or predicting power: {e}",
-        )
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return render_prometheus()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,179 @@
+"""
+Annual energy yield from the local climatology archive.
+
+A site's typical year (services.climatology) gives an 8760 x n_features
+matrix of hourly weather plus solar geometry for the exact point and panel.
+All hours are scored in one batched prediction and the clipped hourly power
+(kW) is summed into monthly and annual kWh. Results are cached per site and
+system configuration; the archive is static, so entries only go away when
+the LRU evicts them or the model or archive version changes.
+
+The model predicts the output of the plant it was trained on
+(context/spg.xls), so simulated energy is that plant's. Each result is
+scaled linearly from TRAINING_PLANT_CAPACITY_KW to the requested system
+size after the cache, which therefore holds one entry per site for every
+system size.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import partial
+
+import numpy as np
+
+from services import metrics
+from services.climatology import MONTH_STARTS, climatology
+from services.hourly_forecast import hourly_power
+from services.prediction_engine import engine
+from services.single_flight import SingleFlight
+from services.solar_position import SOLAR_PANEL_AZIMUTH, SOLAR_PANEL_TILT
+
+ANNUAL_YIELD_CACHE_SIZE = int(os.getenv("ANNUAL_YIELD_CACHE_SIZE", "1024"))
+# Sites are rounded to this many decimals for the cache key (4 is ~11 m)
+ANNUAL_YIELD_SITE_DECIMALS = int(os.getenv("ANNUAL_YIELD_SITE_DECIMALS", "4"))
+# Peak (DC) capacity of the training plant; its measured output tops out at ~3057 kW
+TRAINING_PLANT_CAPACITY_KW = float(os.getenv("TRAINING_PLANT_CAPACITY_KW", "3000"))
+
+SIMULATION_SECONDS = metrics.histogram(
+    "annual_yield_simulation_seconds",
+    "Time to build, score and integrate one 8760-hour typical year.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+
+class AnnualYieldCache:
+    """LRU of annual yield results keyed by site, panel, model and archive version."""
+
+    def __init__(self, max_size=ANNUAL_YIELD_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.hits = metrics.counter("annual_yield_cache_hits_total", "Annual yields served from the cache.")
+        self.misses = metrics.counter("annual_yield_cache_misses_total", "Annual yield lookups that missed.")
+        self.size = metrics.gauge("annual_yield_cache_entries", "Entries currently held in the annual yield cache.")
+
+    @property
+    def enabled(self):
+        return self.max_size > 0
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+                self.hits.inc()
+                return value
+        self.misses.inc()
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            self.size.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size.set(0)
+
+
+annual_yield_cache = AnnualYieldCache()
+# Concurrent requests for the same site and system share one simulation
+annual_yield_flight = SingleFlight("annual_yield")
+
+
+async def _simulate(key, latitude, longitude, tilt, panel_azimuth, num_iterations, use_cache):
+    started = time.perf_counter()
+    year = await asyncio.to_thread(
+        climatology.typical_year,
+        latitude,
+        longitude,
+        engine.feature_names,
+        tilt,
+        panel_azimuth,
+    )
+    if year is None:
+        return None
+
+    # Rows are a whole year of distinct hours, so the per-row prediction
+    # cache would only be churned by them
+    preds = await engine.predict_matrix(year.features, use_cache=False, num_iterations=num_iterations)
+    power = hourly_power(preds, year.features, engine.feature_names)
+    monthly = np.add.reduceat(power, MONTH_STARTS)
+
+    result = {
+        "panel_tilt": tilt,
+        "panel_azimuth": panel_azimuth,
+        "annual_kwh": float(power.sum()),
+        "monthly": {
+            "month": list(range(1, 13)),
+            "energy_kwh": monthly.tolist(),
+        },
+        "peak_power": float(power.max()),
+        "climatology": {
+            "latitude": year.latitude,
+            "longitude": year.longitude,
+            "source_years": list(year.years),
+        },
+        "model_version": engine.model_version,
+    }
+    if use_cache and annual_yield_cache.enabled:
+        annual_yield_cache.put(key, result)
+    SIMULATION_SECONDS.observe(time.perf_counter() - started)
+    return result
+
+
+def _scale(result, system_capacity_kw):
+    """Scales a training-plant result to a system of `system_capacity_kw` kWp."""
+    ratio = system_capacity_kw / TRAINING_PLANT_CAPACITY_KW
+    return {
+        **result,
+        "system_capacity_kw": system_capacity_kw,
+        "annual_kwh": result["annual_kwh"] * ratio,
+        "monthly": {
+            **result["monthly"],
+            "energy_kwh": [energy * ratio for energy in result["monthly"]["energy_kwh"]],
+        },
+        "peak_power": result["peak_power"] * ratio,
+    }
+
+
+async def annual_yield(
+    latitude, longitude, system_capacity_kw, tilt=None, panel_azimuth=None, use_cache=True, num_iterations=None
+):
+    """
+    Returns the annual and monthly yield of a `system_capacity_kw` kWp system
+    at a site from its typical year, or None when the archive has no data
+    near the site. `panel_tilt` and `panel_azimuth` in the result are the
+    values used, defaults included.
+    """
+    tilt = SOLAR_PANEL_TILT if tilt is None else tilt
+    panel_azimuth = SOLAR_PANEL_AZIMUTH if panel_azimuth is None else panel_azimuth
+    await engine.ready()
+    # Normally loaded by warmup; otherwise map it without blocking the loop
+    store = climatology.store or await asyncio.to_thread(climatology.load)
+    key = (
+        round(latitude, ANNUAL_YIELD_SITE_DECIMALS),
+        round(longitude, ANNUAL_YIELD_SITE_DECIMALS),
+        tilt,
+        panel_azimuth,
+        num_iterations,
+        engine.model_version,
+        store["version"],
+    )
+    if use_cache and annual_yield_cache.enabled:
+        result = annual_yield_cache.get(key)
+        if result is not None:
+            return _scale(result, system_capacity_kw)
+    result = await annual_yield_flight.do(
+        key,
+        partial(_simulate, key, latitude, longitude, tilt, panel_azimuth, num_iterations, use_cache),
+    )
+    return None if result is None else _scale(result, system_capacity_kw)
@@ -1,4 +1,5 @@
 import os
+import threading
 import time
 from typing import List
 from fastapi import HTTPException
@@ -38,16 +39,28 @@ def setup_rag_retriever(force_recreate=False):
 
     return vectorstore.as_retriever(search_kwargs={"k": 3})
 
-try:
-    retriever = setup_rag_retriever()
-except Exception as e:
-    print(f"Error setting up RAG retriever: {e}")
-    retriever = None
+retriever = None
+_retriever_attempted = False
+_retriever_lock = threading.Lock()
+
+def init_retriever():
+    """Builds the retriever once; called by the startup warmup or the first chat request."""
+    global retriever, _retriever_attempted
+    with _retriever_lock:
+        if not _retriever_attempted:
+            _retriever_attempted = True
+            try:
+                retriever = setup_rag_retriever()
+            except Exception as e:
+                print(f"Error setting up RAG retriever: {e}")
+                retriever = None
+    return retriever
 
 # --- End RAG Setup ---
 
 def process_chat_enquiry(request: SubsidyQuery) -> ChatResponse:
     start_time = time.time()
+    retriever = init_retriever()
     if retriever is None:
         raise HTTPException(status_code=500, detail="Chat service RAG retriever not initialized.")
 
@@ -0,0 +1,102 @@
+import logging
+import time
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+STATES = ("closed", "half_open", "open")
+
+
+class CircuitOpenError(Exception):
+    def __init__(self, message, retry_after=0.0):
+        super().__init__(message)
+        # Seconds until the breaker lets a trial call through again
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds. It then lets a single trial call through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+
+        labels = {"breaker": name}
+        self.state_gauge = metrics.gauge(
+            "circuit_breaker_state",
+            "Circuit breaker state: 0 closed, 1 half-open, 2 open.",
+            labels,
+        )
+        self.transitions = {
+            state: metrics.counter(
+                "circuit_breaker_transitions_total",
+                "Circuit breaker state changes by the state entered.",
+                {**labels, "state": state},
+            )
+            for state in STATES
+        }
+        self.rejected = metrics.counter(
+            "circuit_breaker_rejected_total",
+            "Calls rejected because the circuit was open.",
+            labels,
+        )
+
+    def _transition(self, state):
+        if state != self.state:
+            logger.warning("Circuit breaker %s: %s -> %s", self.name, self.state, state)
+            self.state = state
+            self.transitions[state].inc()
+            self.state_gauge.set(STATES.index(state))
+
+    def before_call(self):
+        """Raises CircuitOpenError if the call must not go upstream."""
+        if self.state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._transition("half_open")
+        if self.state == "open" or (self.state == "half_open" and self._trial_in_flight):
+            self.rejected.inc()
+            retry_after = 0.0
+            if self.state == "open":
+                retry_after = self.reset_timeout - (time.monotonic() - self._opened_at)
+            raise CircuitOpenError(f"Circuit breaker {self.name} is open", retry_after)
+        if self.state == "half_open":
+            self._trial_in_flight = True
+
+    async def call(self, fn, is_failure=lambda exc: True):
+        """
+        Awaits `fn()` through the breaker. Exceptions for which `is_failure`
+        is true count towards opening the circuit; all are re-raised.
+        """
+        self.before_call()
+        try:
+            result = await fn()
+        except Exception as e:
+            if is_failure(e):
+                self.record_failure()
+            raise
+        finally:
+            # A cancelled or inconclusive trial frees the slot for the next one
+            self._trial_in_flight = False
+        self.record_success()
+        return result
+
+    def record_success(self):
+        self._failures = 0
+        self._trial_in_flight = False
+        self._transition("closed")
+
+    def record_failure(self):
+        self._failures += 1
+        self._trial_in_flight = False
+        if self.state == "half_open" or self._failures >= self.failure_threshold:
+            self._opened_at = time.monotonic()
+            self._transition("open")
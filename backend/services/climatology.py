@@ -0,0 +1,433 @@
+"""
+Local climatology archive: a typical meteorological year (TMY) of hourly
+weather per grid cell, served from a memory-mapped artifact so annual yield
+estimates need no network calls.
+
+Build it from Open-Meteo historical weather exports (JSON from the archive
+API with timezone=UTC, one or more locations per file, any number of years;
+`download` fetches them):
+
+    cd backend
+    python -m services.climatology download --location 28.61,77.21 --start 2014-01-01 --end 2023-12-31 --output exports
+    python -m services.climatology ingest exports/*.json --directory data/climatology
+    CLIMATOLOGY_DIR=data/climatology uvicorn server:app
+
+The store is a services.model_artifact directory holding
+
+    cells    (n_cells, 2)                  int32 grid (row, column), sorted
+    weather  (n_cells, n_variables, 8760)  float32 hourly columns, UTC
+    years    (n_cells, 12)                 int16 source year of each month
+
+so one location reads a single contiguous block. For every calendar month,
+the typical year copies that month from the historical year whose daily
+statistics are closest to the long-term distribution (the
+Finkelstein-Schafer statistic of the Sandia/NREL TMY method, on a reduced
+set of weighted indices). Whole months are copied, so the year keeps real
+weather sequences instead of an hour-by-hour average that would flatten
+every cloudy day. Hours are laid out on REFERENCE_YEAR, which is not a leap
+year; 29 February is dropped.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import warnings
+from dataclasses import dataclass
+
+import numpy as np
+
+from services import metrics
+from services.forecast_decoder import hourly_columns, loads
+from services.hourly_forecast import weather_feature_matrix
+from services.model_artifact import open_artifact, write_artifact
+from services.solar_position import sun_ephemeris
+
+logger = logging.getLogger(__name__)
+
+CLIMATOLOGY_DIR = os.getenv("CLIMATOLOGY_DIR", "")
+# Cells are snapped to this grid; 0.25 deg matches the ERA5 reanalysis behind
+# the Open-Meteo archive.
+CLIMATOLOGY_RESOLUTION = float(os.getenv("CLIMATOLOGY_RESOLUTION", "0.25"))
+# Points without a cell of their own use the nearest cell within this distance
+CLIMATOLOGY_MAX_DISTANCE = float(os.getenv("CLIMATOLOGY_MAX_DISTANCE", "0.5"))
+OPEN_METEO_ARCHIVE_URL = os.getenv("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com/v1/archive")
+
+REFERENCE_YEAR = 2023
+HOURS_PER_YEAR = 8760
+MONTH_HOURS = np.array([31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]) * 24
+MONTH_STARTS = np.concatenate([[0], np.cumsum(MONTH_HOURS)[:-1]])
+
+# Hourly variables kept in the store. The archive has no 80 m or 900 hPa
+# winds; the HOURLY_FEATURES fallbacks fill those features from 10 m.
+ARCHIVE_VARIABLES = (
+    "temperature_2m",
+    "relative_humidity_2m",
+    "pressure_msl",
+    "precipitation",
+    "snowfall",
+    "cloud_cover",
+    "cloud_cover_high",
+    "cloud_cover_mid",
+    "cloud_cover_low",
+    "shortwave_radiation",
+    "wind_speed_10m",
+    "wind_direction_10m",
+    "wind_gusts_10m",
+)
+# (variable, daily statistic, weight) compared when picking each month
+TMY_INDICES = (
+    ("shortwave_radiation", "sum", 0.5),
+    ("temperature_2m", "mean", 0.2),
+    ("temperature_2m", "max", 0.1),
+    ("relative_humidity_2m", "mean", 0.1),
+    ("wind_speed_10m", "mean", 0.1),
+)
+
+LOOKUPS = {
+    result: metrics.counter(
+        "climatology_lookups_total",
+        "Typical-year lookups against the local climatology archive.",
+        {"result": result},
+    )
+    for result in ("hit", "nearest", "miss")
+}
+CELLS = metrics.gauge("climatology_cells", "Grid cells in the loaded climatology archive.")
+
+
+def reference_times():
+    """The 8760 UTC hours of REFERENCE_YEAR, as datetime64[h]."""
+    start = np.datetime64(f"{REFERENCE_YEAR}-01-01T00", "h")
+    return start + np.arange(HOURS_PER_YEAR)
+
+
+def _fs_statistic(sample, reference):
+    """Mean absolute difference between the empirical CDFs of two samples."""
+    sample = np.sort(sample[~np.isnan(sample)])
+    reference = np.sort(reference[~np.isnan(reference)])
+    if not len(sample) or not len(reference):
+        return 0.0
+    reference_cdf = np.arange(1, len(reference) + 1) / len(reference)
+    sample_cdf = np.searchsorted(sample, reference, side="right") / len(sample)
+    return float(np.mean(np.abs(sample_cdf - reference_cdf)))
+
+
+def _daily(values, statistic):
+    days = values.reshape(-1, 24)
+    if np.isnan(days).all():
+        return np.full(len(days), np.nan)
+    with warnings.catch_warnings():
+        # Days without any value come out as NaN and drop out of the CDFs
+        warnings.simplefilter("ignore", RuntimeWarning)
+        return {"sum": np.nansum, "mean": np.nanmean, "max": np.nanmax}[statistic](days, axis=1)
+
+
+def typical_year(hours, columns, variables=ARCHIVE_VARIABLES):
+    """
+    Builds the typical year from hourly history. `hours` are sorted, unique
+    datetime64[h] UTC timestamps and `columns` the matching
+    (n_variables, n_hours) values. Returns `(weather, years)`: an
+    (n_variables, 8760) float32 array on REFERENCE_YEAR and the source year
+    of each month. Only months with every hour present are candidates.
+    """
+    years = hours.astype("datetime64[Y]").astype(np.int64) + 1970
+    months = hours.astype("datetime64[M]").astype(np.int64) % 12
+    day_of_month = (hours.astype("datetime64[D]") - hours.astype("datetime64[M]")).astype(np.int64) + 1
+    keep = ~((months == 1) & (day_of_month == 29))
+    hours, columns, years, months = hours[keep], columns[:, keep], years[keep], months[keep]
+
+    rows = {variable: row for row, variable in enumerate(variables)}
+    indices = [(rows[variable], statistic, weight) for variable, statistic, weight in TMY_INDICES if variable in rows]
+
+    weather = np.full((len(variables), HOURS_PER_YEAR), np.nan, dtype=np.float32)
+    chosen = np.zeros(12, dtype=np.int16)
+    for month in range(12):
+        in_month = months == month
+        candidates = {}
+        for year in np.unique(years[in_month]):
+            selected = np.flatnonzero(in_month & (years == year))
+            if len(selected) == MONTH_HOURS[month]:
+                candidates[int(year)] = selected
+        if not candidates:
+            raise ValueError(f"No complete month {month + 1} in the weather history")
+
+        daily = {
+            year: [_daily(columns[row, selected], statistic) for row, statistic, _ in indices]
+            for year, selected in candidates.items()
+        }
+        long_term = [
+            np.concatenate([daily[year][index] for year in candidates])
+            for index in range(len(indices))
+        ]
+        scores = {
+            year: sum(
+                weight * _fs_statistic(daily[year][index], long_term[index])
+                for index, (_, _, weight) in enumerate(indices)
+            )
+            for year in candidates
+        }
+        # Ties (e.g. a single candidate) go to the most recent year
+        year = min(scores, key=lambda item: (scores[item], -item))
+        start = MONTH_STARTS[month]
+        weather[:, start:start + MONTH_HOURS[month]] = columns[:, candidates[year]]
+        chosen[month] = year
+    return weather, chosen
+
+
+def read_exports(paths):
+    """Yields `(path, index, payload)` for every location in the JSON export files."""
+    for path in paths:
+        with open(path, "rb") as file_obj:
+            data = loads(file_obj.read())
+        for index, payload in enumerate(data if isinstance(data, list) else [data]):
+            yield path, index, payload
+
+
+def _history(payloads):
+    """Merges the payloads of one cell into sorted, de-duplicated hourly columns."""
+    all_hours = []
+    all_columns = []
+    for payload in payloads:
+        if payload.get("utc_offset_seconds", 0):
+            raise ValueError("Weather exports must be requested with timezone=UTC")
+        times, columns = hourly_columns(payload, ARCHIVE_VARIABLES)
+        all_hours.append(np.array(times, dtype="datetime64[h]"))
+        all_columns.append(columns)
+    hours, first = np.unique(np.concatenate(all_hours), return_index=True)
+    return hours, np.concatenate(all_columns, axis=1)[:, first]
+
+
+def ingest(paths, directory, resolution=CLIMATOLOGY_RESOLUTION):
+    """
+    Builds the store in `directory` from Open-Meteo archive exports. Locations
+    in the same grid cell are merged, so a cell may be spread over several
+    files (e.g. one per year). Returns the number of cells written.
+    """
+    # First pass only maps cells to payloads, so memory stays bounded by one
+    # cell's history plus one parsed file
+    sources = {}
+    for path, index, payload in read_exports(paths):
+        cell = (
+            int(np.floor(payload["latitude"] / resolution)),
+            int(np.floor(payload["longitude"] / resolution)),
+        )
+        sources.setdefault(cell, []).append((path, index))
+
+    cells = sorted(sources)
+    scratch = tempfile.mkdtemp(prefix="climatology-")
+    try:
+        weather = np.lib.format.open_memmap(
+            os.path.join(scratch, "weather.npy"),
+            mode="w+",
+            dtype=np.float32,
+            shape=(len(cells), len(ARCHIVE_VARIABLES), HOURS_PER_YEAR),
+        )
+        years = np.zeros((len(cells), 12), dtype=np.int16)
+        written = np.zeros(len(cells), dtype=bool)
+        parsed = (None, None)
+        for position, cell in enumerate(cells):
+            payloads = []
+            for path, index in sources[cell]:
+                if parsed[0] != path:
+                    with open(path, "rb") as file_obj:
+                        data = loads(file_obj.read())
+                    parsed = (path, data if isinstance(data, list) else [data])
+                payloads.append(parsed[1][index])
+            try:
+                weather[position], years[position] = typical_year(*_history(payloads))
+                written[position] = True
+            except ValueError as e:
+                print(f"Warning: skipping climatology cell {cell}: {e}")
+
+        keep = np.flatnonzero(written)
+        if not len(keep):
+            raise ValueError("No grid cell had enough weather history for a typical year")
+        write_artifact(
+            directory,
+            {
+                "cells": np.array(cells, dtype=np.int32).reshape(-1, 2)[keep],
+                "weather": weather if len(keep) == len(cells) else weather[keep],
+                "years": years[keep],
+            },
+            metadata={
+                "variables": list(ARCHIVE_VARIABLES),
+                "resolution": resolution,
+                "reference_year": REFERENCE_YEAR,
+                "locations": sum(len(entries) for entries in sources.values()),
+                "ingested_at": time.time(),
+            },
+        )
+        del weather
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+    print(f"Climatology archive written to {directory}: {len(keep)} cells")
+    return len(keep)
+
+
+def download(locations, start, end, output):
+    """Saves one Open-Meteo archive export per `(latitude, longitude)` for ingest."""
+    import httpx
+
+    os.makedirs(output, exist_ok=True)
+    with httpx.Client(timeout=120) as client:
+        for latitude, longitude in locations:
+            resp = client.get(
+                OPEN_METEO_ARCHIVE_URL,
+                params={
+                    "latitude": latitude,
+                    "longitude": longitude,
+                    "start_date": start,
+                    "end_date": end,
+                    "hourly": ",".join(ARCHIVE_VARIABLES),
+                    "timezone": "UTC",
+                },
+            )
+            resp.raise_for_status()
+            path = os.path.join(output, f"archive_{latitude}_{longitude}_{start}_{end}.json")
+            with open(path, "wb") as file_obj:
+                file_obj.write(resp.content)
+            print(f"Saved {path}")
+
+
+@dataclass(frozen=True)
+class TypicalYear:
+    """
+    Typical-year features for one location. `times` are the UTC hours of
+    REFERENCE_YEAR; `latitude`/`longitude` is the centre of the archive cell
+    the weather came from, and `years` the source year of each month.
+    """
+
+    times: np.ndarray
+    features: np.ndarray
+    latitude: float
+    longitude: float
+    years: tuple
+
+
+class Climatology:
+    def __init__(self, directory=CLIMATOLOGY_DIR, max_distance=CLIMATOLOGY_MAX_DISTANCE):
+        self.directory = directory or None
+        self.max_distance = max_distance
+        self.store = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    def load(self):
+        """Maps the archive; called from warmup and on first use."""
+        with self._lock:
+            if self.store is None:
+                self._load_locked()
+        return self.store
+
+    def _load_locked(self):
+        arrays, manifest = open_artifact(self.directory)
+        metadata = manifest["metadata"]
+        times = reference_times()
+        cells = arrays["cells"]
+        resolution = metadata["resolution"]
+        self.store = {
+            "arrays": arrays,
+            "variables": tuple(metadata["variables"]),
+            "resolution": resolution,
+            # Changes whenever the archive is rebuilt
+            "version": manifest["checksum"],
+            "index": {(int(row), int(column)): position for position, (row, column) in enumerate(cells)},
+            "centers": (cells.astype(np.float64) + 0.5) * resolution,
+            "times": times,
+            # Shared by every lookup's solar geometry
+            "ephemeris": sun_ephemeris(times),
+        }
+        CELLS.set(len(cells))
+        logger.info("Loaded climatology archive from %s: %d cells", self.directory, len(cells))
+
+    def _cell(self, store, latitude, longitude):
+        """Returns `(position, result)` of the archive cell serving the point."""
+        resolution = store["resolution"]
+        key = (int(np.floor(latitude / resolution)), int(np.floor(longitude / resolution)))
+        position = store["index"].get(key)
+        if position is not None:
+            return position, "hit"
+        distance = np.hypot(store["centers"][:, 0] - latitude, store["centers"][:, 1] - longitude)
+        nearest = int(np.argmin(distance))
+        if distance[nearest] <= self.max_distance:
+            return nearest, "nearest"
+        return None, "miss"
+
+    def typical_year(self, latitude, longitude, feature_names, tilt=None, panel_azimuth=None):
+        """
+        Returns the TypicalYear feature matrix for a location, or None if the
+        archive is disabled or has no cell close enough. The solar features
+        are computed for the exact point and panel.
+        """
+        if not self.enabled:
+            return None
+        store = self.store or self.load()
+        position, result = self._cell(store, latitude, longitude)
+        LOOKUPS[result].inc()
+        if position is None:
+            return None
+
+        arrays = store["arrays"]
+        features = weather_feature_matrix(
+            store["times"],
+            arrays["weather"][position].astype(np.float64),
+            store["variables"],
+            feature_names,
+            latitude,
+            longitude,
+            tilt,
+            panel_azimuth,
+            ephemeris=store["ephemeris"],
+        )
+        center = store["centers"][position]
+        return TypicalYear(
+            times=store["times"],
+            features=features,
+            latitude=float(center[0]),
+            longitude=float(center[1]),
+            years=tuple(int(year) for year in arrays["years"][position]),
+        )
+
+
+climatology = Climatology()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    download_parser = commands.add_parser("download", help="Fetch hourly history from the Open-Meteo archive")
+    download_parser.add_argument("--location", action="append", required=True, help="lat,lon; repeat for more")
+    download_parser.add_argument("--start", required=True, help="YYYY-MM-DD")
+    download_parser.add_argument("--end", required=True, help="YYYY-MM-DD")
+    download_parser.add_argument("--output", default="exports")
+
+    ingest_parser = commands.add_parser("ingest", help="Build the typical-year archive from exports")
+    ingest_parser.add_argument("paths", nargs="+", help="Open-Meteo archive JSON files")
+    ingest_parser.add_argument("--directory", default=CLIMATOLOGY_DIR or None, required=not CLIMATOLOGY_DIR)
+    ingest_parser.add_argument("--resolution", type=float, default=CLIMATOLOGY_RESOLUTION)
+    args = parser.parse_args()
+
+    if args.command == "download":
+        download(
+            [tuple(float(value) for value in location.split(",")) for location in args.location],
+            args.start,
+            args.end,
+            args.output,
+        )
+    else:
+        try:
+            ingest(args.paths, args.directory, args.resolution)
+        except ValueError as e:
+            sys.exit(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+NumPy fast path for the fitted sklearn preprocessing steps.
+
+The fitted preprocessor is inspected once (normally by the model registry when
+it loads a new artifact generation) and, when every step is an affine scaler,
+collapsed into a single column-wise `(X - shift) / divisor`. Feature rows are
+taken straight from the Pydantic models into a contiguous array in the
+preprocessor's column order, so no DataFrame is built per request.
+"""
+
+import numpy as np
+
+
+class AffineTransform:
+    """Column-wise `(X - shift) / divisor`, the form sklearn's scalers use internally."""
+
+    def __init__(self, shift, divisor):
+        self.shift = np.asarray(shift, dtype=np.float64)
+        self.divisor = np.asarray(divisor, dtype=np.float64)
+
+    def apply(self, X):
+        return (X - self.shift) / self.divisor
+
+    def invert(self, Y):
+        return Y * self.divisor + self.shift
+
+    def then(self, other) -> "AffineTransform":
+        # ((X - a) / b - c) / d == (X - (a + c * b)) / (b * d)
+        return AffineTransform(self.shift + other.shift * self.divisor, self.divisor * other.divisor)
+
+
+def _identity(n_features):
+    return AffineTransform(np.zeros(n_features), np.ones(n_features))
+
+
+def _fuse_step(step, n_features):
+    if step is None or step == "passthrough":
+        return _identity(n_features)
+
+    name = type(step).__name__
+    if name == "Pipeline":
+        fused = _identity(n_features)
+        for _, inner in step.steps:
+            inner_fused = _fuse_step(inner, n_features)
+            if inner_fused is None:
+                return None
+            fused = fused.then(inner_fused)
+        return fused
+
+    if name == "StandardScaler":
+        # mean_ is fitted even with with_mean=False, but transform ignores it
+        mean = getattr(step, "mean_", None) if step.with_mean else None
+        scale = getattr(step, "scale_", None) if step.with_std else None
+        return AffineTransform(
+            np.zeros(n_features) if mean is None else mean,
+            np.ones(n_features) if scale is None else scale,
+        )
+    if name == "RobustScaler":
+        center = getattr(step, "center_", None) if step.with_centering else None
+        scale = getattr(step, "scale_", None) if step.with_scaling else None
+        return AffineTransform(
+            np.zeros(n_features) if center is None else center,
+            np.ones(n_features) if scale is None else scale,
+        )
+    if name == "MaxAbsScaler":
+        return AffineTransform(np.zeros(n_features), step.scale_)
+    if name == "MinMaxScaler" and not getattr(step, "clip", False):
+        # X * scale_ + min_ == (X - (-min_ / scale_)) / (1 / scale_)
+        return AffineTransform(-step.min_ / step.scale_, 1.0 / step.scale_)
+    if name == "FunctionTransformer" and step.func is None:
+        return _identity(n_features)
+    return None
+
+
+def fuse_transformer(transformer):
+    """
+    Returns an AffineTransform equivalent to `transformer.transform`, or None if
+    any step cannot be fused and the sklearn/DataFrame route must be used.
+    """
+    n_features = getattr(transformer, "n_features_in_", None)
+    if n_features is None:
+        return None
+    return _fuse_step(transformer, n_features)
+
+
+def feature_columns(transformer):
+    names = getattr(transformer, "feature_names_in_", None)
+    return tuple(str(name) for name in names) if names is not None else None
+
+
+def features_to_array(features, columns, dtype=np.float64) -> np.ndarray:
+    """
+    Builds a C-contiguous (n_rows, n_columns) array from PowerPredictionFeatures
+    models or plain dicts, in `columns` order.
+    """
+    if not features:
+        return np.empty((0, len(columns)), dtype=dtype)
+    if isinstance(features[0], dict):
+        rows = [[row[column] for column in columns] for row in features]
+    else:
+        rows = [[getattr(row, column) for column in columns] for row in features]
+    return np.array(rows, dtype=dtype)
@@ -0,0 +1,46 @@
+"""
+Decodes Open-Meteo forecast responses into NumPy columns.
+
+Response bodies are parsed with orjson when it is installed (it is pinned in
+requirements.txt) and with the standard library otherwise. Each requested
+hourly series is converted once into a float64 column, with JSON nulls and
+absent variables as NaN, so callers work on whole columns instead of
+walking the lists value by value.
+"""
+
+import json
+
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(content):
+    """Parses a JSON response body given as bytes or str."""
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def hourly_columns(data, variables):
+    """
+    Returns `(times, columns)`: the hourly timestamps of a decoded payload and
+    an (n_variables, n_hours) float64 array with one row per name in
+    `variables`.
+    """
+    hourly = data.get("hourly", {})
+    times = hourly.get("time", [])
+    columns = np.full((len(variables), len(times)), np.nan)
+    for row, variable in enumerate(variables):
+        values = hourly.get(variable)
+        if not values:
+            continue
+        try:
+            columns[row] = np.fromiter(values, dtype=np.float64, count=len(values))
+        except TypeError:
+            # The series has nulls, which only the slower generic conversion turns into NaN
+            columns[row] = np.array(values, dtype=np.float64)
+    return times, columns
@@ -0,0 +1,376 @@
+"""
+Precomputed forecast grid over India.
+
+A background scheduler fetches the Open-Meteo forecast for every node of a
+regular lat/lon grid once per refresh interval, builds the hourly feature
+matrix of every node and scores all of them in one batched prediction. The
+result is kept as compact float32 arrays:
+
+    features  (n_lat, n_lon, n_hours, n_features)
+    power     (n_lat, n_lon, n_hours)
+    sunshine  (n_lat, n_lon)  sunshine duration of the first forecast day, s
+
+Because the grid is regular, the spatial index is plain arithmetic: a lookup
+finds the surrounding nodes in O(1) and interpolates them (bilinear by
+default), which takes microseconds. Lookups outside the grid, or against a
+grid older than FORECAST_GRID_MAX_AGE, return None and the caller falls back
+to a live fetch.
+
+With FORECAST_GRID_DIR set, each refresh is also written as a memory-mapped
+artifact (services.model_artifact) and reloaded at startup, so restarts and
+other workers on the host can serve from the grid immediately. Workers that
+share the directory elect one refresher through a lock file; the others
+reload the grid whenever its manifest changes instead of fetching their own.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: every worker refreshes its own grid
+    fcntl = None
+
+from services import metrics
+from services.hourly_forecast import SOLAR_FEATURES, site_feature_matrices
+from services.model_artifact import open_artifact, read_manifest, write_artifact
+from services.prediction_engine import engine
+from services.solar_position import SOLAR_PANEL_AZIMUTH, SOLAR_PANEL_TILT, solar_geometry, sun_ephemeris
+from services.weather_service import fetch_forecasts
+
+logger = logging.getLogger(__name__)
+
+FORECAST_GRID_ENABLED = os.getenv("FORECAST_GRID_ENABLED", "0").lower() in ("1", "true", "yes")
+# lat_min,lat_max,lon_min,lon_max in degrees; the default covers mainland India
+FORECAST_GRID_BOUNDS = tuple(float(value) for value in os.getenv("FORECAST_GRID_BOUNDS", "6,37,68,98").split(","))
+# 1 deg gives 32 x 31 = 992 nodes, i.e. 992 Open-Meteo locations per refresh
+FORECAST_GRID_RESOLUTION = float(os.getenv("FORECAST_GRID_RESOLUTION", "1.0"))
+FORECAST_GRID_INTERPOLATION = os.getenv("FORECAST_GRID_INTERPOLATION", "bilinear")
+# Refresh once per upstream update; serve the grid for at most MAX_AGE seconds
+FORECAST_GRID_REFRESH_SECONDS = float(os.getenv("FORECAST_GRID_REFRESH_SECONDS", "3600"))
+FORECAST_GRID_MAX_AGE = float(os.getenv("FORECAST_GRID_MAX_AGE", "10800"))
+FORECAST_GRID_DIR = os.getenv("FORECAST_GRID_DIR", "")
+# How often workers that do not refresh the shared grid look for a newer one
+FORECAST_GRID_POLL_SECONDS = float(os.getenv("FORECAST_GRID_POLL_SECONDS", "30"))
+REFRESH_LOCK_FILE = "refresh.lock"
+
+LOOKUPS = {
+    result: metrics.counter(
+        "forecast_grid_lookups_total",
+        "Location lookups against the precomputed forecast grid.",
+        {"result": result},
+    )
+    for result in ("hit", "miss", "stale")
+}
+REFRESH_SECONDS = metrics.histogram(
+    "forecast_grid_refresh_seconds",
+    "Time to fetch and score one forecast grid refresh.",
+    buckets=(1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+REFRESH_ERRORS = metrics.counter("forecast_grid_refresh_errors_total", "Forecast grid refreshes that failed.")
+GRID_POINTS = metrics.gauge("forecast_grid_points", "Nodes in the current forecast grid.")
+GRID_FETCHED_AT = metrics.gauge("forecast_grid_fetched_at_seconds", "Unix time the current forecast grid was fetched.")
+
+
+@dataclass(frozen=True)
+class GridSnapshot:
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    times: list
+    features: np.ndarray
+    power: np.ndarray
+    sunshine: np.ndarray
+    feature_names: tuple
+    model_version: str
+    fetched_at: float
+    # sun_ephemeris(times), shared by every lookup that recomputes solar geometry
+    ephemeris: tuple = None
+
+    def __post_init__(self):
+        if self.ephemeris is None:
+            object.__setattr__(self, "ephemeris", sun_ephemeris(self.times))
+
+    def to_arrays(self):
+        return {
+            "latitudes": self.latitudes,
+            "longitudes": self.longitudes,
+            "times": np.array(self.times, dtype="datetime64[m]"),
+            "features": self.features,
+            "power": self.power,
+            "sunshine": self.sunshine,
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, metadata):
+        return cls(
+            latitudes=arrays["latitudes"],
+            longitudes=arrays["longitudes"],
+            times=np.datetime_as_string(arrays["times"], unit="m").tolist(),
+            features=arrays["features"],
+            power=arrays["power"],
+            sunshine=arrays["sunshine"],
+            feature_names=tuple(metadata["feature_names"]),
+            model_version=metadata["model_version"],
+            fetched_at=metadata["fetched_at"],
+        )
+
+
+@dataclass(frozen=True)
+class GridForecast:
+    """
+    Interpolated forecast for one location. `data` mimics the parts of an
+    Open-Meteo payload the energy response reads. `power` is None when the
+    features must be re-scored (custom panel orientation or a newer model).
+    """
+
+    data: dict
+    times: list
+    features: np.ndarray
+    power: np.ndarray
+
+
+class ForecastGrid:
+    def __init__(
+        self,
+        enabled=FORECAST_GRID_ENABLED,
+        bounds=FORECAST_GRID_BOUNDS,
+        resolution=FORECAST_GRID_RESOLUTION,
+        interpolation=FORECAST_GRID_INTERPOLATION,
+        max_age=FORECAST_GRID_MAX_AGE,
+        directory=FORECAST_GRID_DIR,
+    ):
+        if interpolation not in ("bilinear", "nearest"):
+            raise ValueError(f"Unknown grid interpolation '{interpolation}', expected 'bilinear' or 'nearest'")
+        self.enabled = enabled
+        self.bounds = bounds
+        self.resolution = resolution
+        self.interpolation = interpolation
+        self.max_age = max_age
+        self.directory = directory or None
+        self.snapshot = None
+        # Checksum of the artifact the installed snapshot came from
+        self._checksum = None
+        self._lock_file = None
+
+    def nodes(self):
+        lat_min, lat_max, lon_min, lon_max = self.bounds
+        latitudes = np.round(np.arange(lat_min, lat_max + self.resolution / 2, self.resolution), 6)
+        longitudes = np.round(np.arange(lon_min, lon_max + self.resolution / 2, self.resolution), 6)
+        return latitudes, longitudes
+
+    async def refresh(self):
+        started = time.perf_counter()
+        latitudes, longitudes = self.nodes()
+        points = [(float(lat), float(lon)) for lat in latitudes for lon in longitudes]
+        # Bypass the grid-cell cache: these lookups would only evict user entries
+        forecasts = await fetch_forecasts(points, use_cache=False)
+
+        await engine.ready()
+        feature_names = tuple(engine.feature_names)
+        times, features = await asyncio.to_thread(_node_features, points, forecasts, feature_names)
+        power = await engine.predict_matrix(features.reshape(-1, len(feature_names)), use_cache=False)
+        sunshine = [
+            (data.get("daily", {}).get("sunshine_duration") or [None])[0]
+            for data in forecasts
+        ]
+
+        shape = (len(latitudes), len(longitudes))
+        snapshot = GridSnapshot(
+            latitudes=latitudes,
+            longitudes=longitudes,
+            times=times,
+            features=features.astype(np.float32).reshape(*shape, len(times), len(feature_names)),
+            power=power.astype(np.float32).reshape(*shape, len(times)),
+            sunshine=np.array(sunshine, dtype=np.float32).reshape(shape),
+            feature_names=feature_names,
+            model_version=engine.model_version,
+            fetched_at=time.time(),
+        )
+        self._install(snapshot)
+        if self.directory:
+            await asyncio.to_thread(self.save, snapshot)
+
+        REFRESH_SECONDS.observe(time.perf_counter() - started)
+        logger.info(
+            "Forecast grid refreshed: %d nodes x %d hours in %.1fs", len(points), len(times), time.perf_counter() - started
+        )
+        return snapshot
+
+    def _install(self, snapshot):
+        self.snapshot = snapshot
+        GRID_POINTS.set(len(snapshot.latitudes) * len(snapshot.longitudes))
+        GRID_FETCHED_AT.set(snapshot.fetched_at)
+
+    def save(self, snapshot):
+        manifest = write_artifact(
+            self.directory,
+            snapshot.to_arrays(),
+            metadata={
+                "feature_names": list(snapshot.feature_names),
+                "model_version": snapshot.model_version,
+                "fetched_at": snapshot.fetched_at,
+            },
+        )
+        self._checksum = manifest["checksum"]
+
+    def load(self):
+        """
+        Loads the last saved grid, if any, unless it is already too old to
+        serve. Returns the installed snapshot without touching the blob when
+        the saved grid has not changed since the last load or save.
+        """
+        if not self.directory:
+            return None
+        try:
+            if read_manifest(self.directory)["checksum"] == self._checksum:
+                return self.snapshot
+            arrays, manifest = open_artifact(self.directory)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning("Could not load forecast grid from %s: %s", self.directory, e)
+            return None
+        self._checksum = manifest["checksum"]
+        snapshot = GridSnapshot.from_arrays(arrays, manifest["metadata"])
+        if time.time() - snapshot.fetched_at > self.max_age:
+            return None
+        self._install(snapshot)
+        return snapshot
+
+    def _weights(self, snapshot, latitude, longitude):
+        """Returns `[(lat_index, lon_index, weight), ...]` for the nodes around the point."""
+        lat_position = (latitude - snapshot.latitudes[0]) / self.resolution
+        lon_position = (longitude - snapshot.longitudes[0]) / self.resolution
+        n_lat, n_lon = len(snapshot.latitudes), len(snapshot.longitudes)
+        if not (0 <= lat_position <= n_lat - 1 and 0 <= lon_position <= n_lon - 1):
+            return None
+
+        if self.interpolation == "nearest" or n_lat < 2 or n_lon < 2:
+            return [(int(round(lat_position)), int(round(lon_position)), 1.0)]
+
+        i = min(int(lat_position), n_lat - 2)
+        j = min(int(lon_position), n_lon - 2)
+        u = lat_position - i
+        v = lon_position - j
+        return [
+            (i, j, (1 - u) * (1 - v)),
+            (i + 1, j, u * (1 - v)),
+            (i, j + 1, (1 - u) * v),
+            (i + 1, j + 1, u * v),
+        ]
+
+    def lookup(self, latitude, longitude, tilt=None, panel_azimuth=None):
+        """Returns a GridForecast for the point, or None if the grid cannot serve it."""
+        snapshot = self.snapshot
+        if snapshot is None:
+            LOOKUPS["miss"].inc()
+            return None
+        if time.time() - snapshot.fetched_at > self.max_age:
+            LOOKUPS["stale"].inc()
+            return None
+        weights = self._weights(snapshot, latitude, longitude)
+        if weights is None:
+            LOOKUPS["miss"].inc()
+            return None
+
+        features = sum(weight * snapshot.features[i, j] for i, j, weight in weights).astype(np.float64)
+        power = sum(weight * snapshot.power[i, j] for i, j, weight in weights).astype(np.float64)
+        sunshine = float(sum(weight * snapshot.sunshine[i, j] for i, j, weight in weights))
+
+        default_panel = (
+            (tilt is None or tilt == SOLAR_PANEL_TILT)
+            and (panel_azimuth is None or panel_azimuth == SOLAR_PANEL_AZIMUTH)
+        )
+        if not default_panel or snapshot.model_version != engine.model_version:
+            # The features will be re-scored, so give them the exact solar
+            # geometry of the requested point and panel
+            columns = [snapshot.feature_names.index(name) for name in SOLAR_FEATURES]
+            features[:, columns] = np.column_stack(
+                solar_geometry(
+                    snapshot.times,
+                    latitude,
+                    longitude,
+                    tilt,
+                    panel_azimuth,
+                    ephemeris=snapshot.ephemeris,
+                )
+            )
+            power = None
+
+        LOOKUPS["hit"].inc()
+        data = {
+            "daily": {"sunshine_duration": [None if np.isnan(sunshine) else sunshine]},
+        }
+        return GridForecast(data=data, times=snapshot.times, features=features, power=power)
+
+    def _lead(self):
+        """
+        Returns True if this process refreshes the grid. With a shared
+        directory only the worker holding its refresh lock does; the lock lives
+        as long as the process, so another worker takes over if it exits.
+        """
+        if self._lock_file is not None or not self.directory or fcntl is None:
+            return True
+        os.makedirs(self.directory, exist_ok=True)
+        lock_file = open(os.path.join(self.directory, REFRESH_LOCK_FILE), "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        logger.info("Refreshing the forecast grid in %s from this worker (pid %d)", self.directory, os.getpid())
+        return True
+
+    def _release(self):
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+    async def run_scheduler(self, interval=FORECAST_GRID_REFRESH_SECONDS, poll_interval=FORECAST_GRID_POLL_SECONDS):
+        """
+        Refreshes the grid every `interval` seconds until cancelled. Workers
+        that lose the refresh election reload the shared grid instead,
+        checking for a new one every `poll_interval` seconds.
+        """
+        try:
+            await asyncio.to_thread(self.load)
+            while True:
+                if not self._lead():
+                    await asyncio.sleep(poll_interval)
+                    await asyncio.to_thread(self.load)
+                    continue
+                if self.snapshot is not None:
+                    age = time.time() - self.snapshot.fetched_at
+                    await asyncio.sleep(max(0.0, interval - age))
+                try:
+                    await self.refresh()
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    REFRESH_ERRORS.inc()
+                    logger.error("Error refreshing forecast grid: %s - %s", type(e).__name__, e)
+                    # Retry sooner than a full interval after a failed refresh
+                    await asyncio.sleep(min(interval, 300))
+        finally:
+            self._release()
+
+
+def _node_features(points, forecasts, feature_names):
+    """Builds the `(n_nodes, n_hours, n_features)` matrix for the grid nodes."""
+    matrices = site_feature_matrices(forecasts, feature_names, [(lat, lon, None, None) for lat, lon in points])
+    times = matrices[0][0] if matrices else None
+    for (latitude, longitude), (node_times, _) in zip(points, matrices):
+        if node_times != times:
+            raise ValueError(f"Forecast hours for ({latitude}, {longitude}) do not match the rest of the grid")
+    if not times:
+        raise ValueError("Weather forecast contained no hourly data")
+    return times, np.stack([features for _, features in matrices])
+
+
+forecast_grid = ForecastGrid()
@@ -0,0 +1,218 @@
+"""
+Turns an Open-Meteo hourly forecast into model features and integrates the
+predicted power into energy.
+
+All hours of the forecast become rows of one feature matrix, so the whole
+horizon is scored with a single batched prediction.
+"""
+
+import logging
+import time
+
+import numpy as np
+
+from models.requests import PowerPredictionFeatures
+from services.forecast_decoder import hourly_columns
+from services.solar_position import SOLAR_PANEL_AZIMUTH, SOLAR_PANEL_TILT, solar_geometry, sun_ephemeris
+
+logger = logging.getLogger(__name__)
+
+# Open-Meteo hourly variables for each model feature, in order of preference.
+# Where a variable is null or absent (some models have no 80 m or pressure
+# level winds), the next one fills in.
+HOURLY_FEATURES = {
+    "temperature_2_m_above_gnd": ("temperature_2m",),
+    "relative_humidity_2_m_above_gnd": ("relative_humidity_2m",),
+    "mean_sea_level_pressure_MSL": ("pressure_msl",),
+    "total_precipitation_sfc": ("precipitation",),
+    "snowfall_amount_sfc": ("snowfall",),
+    "total_cloud_cover_sfc": ("cloud_cover",),
+    "high_cloud_cover_high_cld_lay": ("cloud_cover_high",),
+    "medium_cloud_cover_mid_cld_lay": ("cloud_cover_mid",),
+    "low_cloud_cover_low_cld_lay": ("cloud_cover_low",),
+    "shortwave_radiation_backwards_sfc": ("shortwave_radiation",),
+    "wind_speed_10_m_above_gnd": ("wind_speed_10m",),
+    "wind_direction_10_m_above_gnd": ("wind_direction_10m",),
+    "wind_speed_80_m_above_gnd": ("wind_speed_80m", "wind_speed_10m"),
+    "wind_direction_80_m_above_gnd": ("wind_direction_80m", "wind_direction_10m"),
+    "wind_speed_900_mb": ("wind_speed_900hPa", "wind_speed_80m", "wind_speed_10m"),
+    "wind_direction_900_mb": ("wind_direction_900hPa", "wind_direction_80m", "wind_direction_10m"),
+    "wind_gust_10_m_above_gnd": ("wind_gusts_10m",),
+}
+# Every variable above, requested once from Open-Meteo
+HOURLY_VARIABLES = tuple(dict.fromkeys(variable for sources in HOURLY_FEATURES.values() for variable in sources))
+SOLAR_FEATURES = ("zenith", "azimuth", "angle_of_incidence")
+RADIATION_FEATURE = "shortwave_radiation_backwards_sfc"
+
+
+def hourly_feature_matrix(data, feature_names, latitude=None, longitude=None, tilt=None, panel_azimuth=None):
+    """
+    Returns `(times, features)`: the hourly timestamps of the forecast and an
+    (n_hours, n_features) matrix in `feature_names` order. Weather values come
+    from the first of the feature's HOURLY_FEATURES variables that has them,
+    and are 0 where none does. Given a location, the solar features are
+    computed for each hour (times are UTC, as requested from Open-Meteo);
+    otherwise they and any other feature without a weather source keep their
+    PowerPredictionFeatures defaults.
+    """
+    times, columns = hourly_columns(data, HOURLY_VARIABLES)
+    features = weather_feature_matrix(times, columns, HOURLY_VARIABLES, feature_names, latitude, longitude, tilt, panel_azimuth)
+    return times, features
+
+
+def weather_feature_matrix(
+    times,
+    columns,
+    variables,
+    feature_names,
+    latitude=None,
+    longitude=None,
+    tilt=None,
+    panel_azimuth=None,
+    ephemeris=None,
+):
+    """
+    hourly_feature_matrix for already decoded weather: `columns` is an
+    (n_variables, n_hours) array with one row per name in `variables`. An
+    all-NaN row counts as absent. `ephemeris` is an optional precomputed
+    `sun_ephemeris(times)`.
+
+    For many sites sharing `times`, pass `columns` of shape (n_sites,
+    n_variables, n_hours) and the location and panel as (n_sites,) arrays;
+    the result is then (n_sites, n_hours, n_features).
+    """
+    columns = np.asarray(columns, dtype=np.float64)
+    sites = columns.shape[:-2]
+    features = np.empty((*sites, len(times), len(feature_names)), dtype=np.float64)
+
+    solar = {}
+    if latitude is not None and longitude is not None and len(times):
+        if sites:
+            # (n_sites, 1) against (n_hours,) broadcasts to (n_sites, n_hours)
+            latitude, longitude, tilt, panel_azimuth = (
+                None if value is None else np.asarray(value, dtype=np.float64)[:, None]
+                for value in (latitude, longitude, tilt, panel_azimuth)
+            )
+        solar = dict(zip(
+            SOLAR_FEATURES,
+            solar_geometry(times, latitude, longitude, tilt, panel_azimuth, ephemeris=ephemeris),
+        ))
+
+    # (column, source rows) per weather feature, skipping variables without data
+    rows = {variable: row for row, variable in enumerate(variables)}
+    if len(times):
+        present = ~np.isnan(columns).all(axis=-1).reshape(-1, len(variables)).any(axis=0)
+    else:
+        present = np.zeros(len(variables), dtype=bool)
+    weather = []
+    for column, name in enumerate(feature_names):
+        if name in solar:
+            features[..., column] = solar[name]
+        elif name in HOURLY_FEATURES:
+            sources = [rows[variable] for variable in HOURLY_FEATURES[name] if variable in rows]
+            weather.append((column, [row for row in sources if present[row]] or sources[:1]))
+        else:
+            features[..., column] = PowerPredictionFeatures.model_fields[name].default
+    if not weather:
+        return features
+
+    # All weather features in one gather from their preferred variables
+    values = np.stack([
+        columns[..., sources[0], :] if sources else np.full((*sites, len(times)), np.nan)
+        for _, sources in weather
+    ], axis=-2)
+    missing = np.isnan(values)
+    if missing.any():
+        for row, (_, sources) in enumerate(weather):
+            for fallback in sources[1:]:
+                gaps = np.isnan(values[..., row, :])
+                if not gaps.any():
+                    break
+                values[..., row, :][gaps] = columns[..., fallback, :][gaps]
+        missing = np.isnan(values)
+        for row in np.flatnonzero(missing.any(axis=-1).reshape(-1, len(weather)).any(axis=0)):
+            name = feature_names[weather[row][0]]
+            logger.warning("Missing weather data for %s in %d hours, using default 0.", name, int(missing[..., row, :].sum()))
+        values[missing] = 0
+    features[..., [column for column, _ in weather]] = np.swapaxes(values, -1, -2)
+    return features
+
+
+def site_feature_matrices(payloads, feature_names, sites):
+    """
+    hourly_feature_matrix for many `(latitude, longitude, tilt, panel_azimuth)`
+    sites, one Open-Meteo payload each; returns a `(times, features)` pair
+    per site. Sites whose forecasts share timestamps, as all sites of one
+    multi-location request do, are built together with a single sun
+    ephemeris and one broadcast solar-position pass.
+    """
+    decoded = [hourly_columns(data, HOURLY_VARIABLES) for data in payloads]
+    groups = {}
+    for index, (times, _) in enumerate(decoded):
+        groups.setdefault(tuple(times), []).append(index)
+
+    results = [None] * len(decoded)
+    for indexes in groups.values():
+        times = decoded[indexes[0]][0]
+        latitude, longitude, tilt, panel_azimuth = np.array(
+            [
+                (
+                    sites[index][0],
+                    sites[index][1],
+                    SOLAR_PANEL_TILT if sites[index][2] is None else sites[index][2],
+                    SOLAR_PANEL_AZIMUTH if sites[index][3] is None else sites[index][3],
+                )
+                for index in indexes
+            ],
+            dtype=np.float64,
+        ).T
+        features = weather_feature_matrix(
+            times,
+            np.stack([decoded[index][1] for index in indexes]),
+            HOURLY_VARIABLES,
+            feature_names,
+            latitude,
+            longitude,
+            tilt,
+            panel_azimuth,
+            ephemeris=sun_ephemeris(times) if len(times) else None,
+        )
+        for index, site_features in zip(indexes, features):
+            results[index] = (decoded[index][0], site_features)
+    return results
+
+
+def current_hour_index(data, times, now=None):
+    """
+    Index of the forecast hour containing the current time, or 0 if it is not
+    in the series. The hour comes from the wall clock, shifted into the
+    payload's timezone by `utc_offset_seconds`, rather than from
+    `current.time`, which is as old as the payload when it is served stale.
+    """
+    now = time.time() if now is None else now
+    hour = time.strftime("%Y-%m-%dT%H:00", time.gmtime(now + data.get("utc_offset_seconds", 0)))
+    try:
+        return times.index(hour)
+    except ValueError:
+        return 0
+
+
+def hourly_power(preds, features, feature_names):
+    """
+    Clips predictions to zero and zeroes hours without any shortwave
+    radiation. The training data has few night-time rows, so the raw model
+    output is not reliably zero after dark.
+    """
+    power = np.clip(np.asarray(preds, dtype=np.float64), 0, None)
+    if RADIATION_FEATURE in feature_names:
+        radiation = features[:, list(feature_names).index(RADIATION_FEATURE)]
+        power[radiation <= 0] = 0
+    return power
+
+
+def daily_energy_kwh(times, power_kw):
+    """Integrates hourly mean power (kW) into energy per UTC day (kWh)."""
+    dates = [time[:10] for time in times]
+    days, inverse = np.unique(np.array(dates), return_inverse=True)
+    energy = np.bincount(inverse, weights=power_kw, minlength=len(days)) if len(dates) else np.zeros(0)
+    return days.tolist(), energy
@@ -0,0 +1,129 @@
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from services import metrics
+
+# "thread" shares the process-wide model registry; "process" runs each worker
+# in its own interpreter with the models preloaded by _init_worker.
+INFERENCE_EXECUTOR = os.getenv("INFERENCE_EXECUTOR", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "2"))
+# Maximum number of tasks queued or running before new work is rejected.
+INFERENCE_MAX_QUEUE = int(os.getenv("INFERENCE_MAX_QUEUE", "64"))
+
+_pipeline = None
+
+
+class InferenceQueueFull(Exception):
+    pass
+
+
+def _worker_pipeline():
+    global _pipeline
+    if _pipeline is None:
+        from services.power_pipeline import PredictPipeline
+
+        _pipeline = PredictPipeline()
+    return _pipeline
+
+
+def _init_worker():
+    from services.model_registry import get_artifacts
+
+    _worker_pipeline()
+    get_artifacts()
+
+
+def predict_matrix(features, num_iterations=None):
+    return _worker_pipeline().predict_batch(features, num_iterations=num_iterations)
+
+
+def _timed_call(fn, args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+class InferenceExecutor:
+    """
+    Runs CPU-bound prediction work off the event loop. At most `max_queue`
+    tasks may be waiting or running; beyond that `run` raises
+    InferenceQueueFull so handlers can shed load instead of piling up.
+    """
+
+    def __init__(self, kind=INFERENCE_EXECUTOR, workers=INFERENCE_WORKERS, max_queue=INFERENCE_MAX_QUEUE):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unknown inference executor '{kind}', expected 'thread' or 'process'")
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self._pool = None
+        self._in_flight = 0
+
+        labels = {"executor": kind}
+        self.in_flight = metrics.gauge(
+            "inference_in_flight",
+            "Inference tasks queued or running.",
+            labels,
+        )
+        self.rejected = metrics.counter(
+            "inference_rejected_total",
+            "Inference tasks rejected because the queue was full.",
+            labels,
+        )
+        self.queue_wait = metrics.histogram(
+            "inference_queue_wait_seconds",
+            "Time an inference task waited for a free worker.",
+            labels,
+        )
+        self.run_time = metrics.histogram(
+            "inference_run_seconds",
+            "Time an inference task spent executing in a worker.",
+            labels,
+        )
+
+    def start(self):
+        if self._pool is not None:
+            return
+        if self.kind == "process":
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        else:
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.workers,
+                thread_name_prefix="inference",
+            )
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def run(self, fn, *args):
+        if self._in_flight >= self.max_queue:
+            self.rejected.inc()
+            raise InferenceQueueFull(f"Inference queue is full ({self.max_queue} tasks)")
+
+        self.start()
+        self._in_flight += 1
+        self.in_flight.set(self._in_flight)
+        submitted = time.perf_counter()
+        try:
+            result, run_seconds = await asyncio.get_running_loop().run_in_executor(
+                self._pool, _timed_call, fn, args
+            )
+        finally:
+            self._in_flight -= 1
+            self.in_flight.set(self._in_flight)
+
+        self.run_time.observe(run_seconds)
+        self.queue_wait.observe(max(0.0, time.perf_counter() - submitted - run_seconds))
+        return result
+
+
+inference_executor = InferenceExecutor()
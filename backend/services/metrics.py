@@ -0,0 +1,109 @@
+import threading
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_lock = threading.Lock()
+_metrics = {}
+
+
+def _label_text(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{value}"' for key, value in labels) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.value = 0.0
+
+    def inc(self, amount=1.0):
+        with _lock:
+            self.value += amount
+
+    def samples(self):
+        return [(self.name, self.labels, self.value)]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value):
+        with _lock:
+            self.value = float(value)
+
+    def dec(self, amount=1.0):
+        self.inc(-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        with _lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.bucket_counts[i] += 1
+
+    def samples(self):
+        samples = []
+        for bound, bucket_count in zip(self.buckets, self.bucket_counts):
+            samples.append((f"{self.name}_bucket", self.labels + (("le", repr(bound)),), bucket_count))
+        samples.append((f"{self.name}_bucket", self.labels + (("le", "+Inf"),), self.count))
+        samples.append((f"{self.name}_sum", self.labels, self.sum))
+        samples.append((f"{self.name}_count", self.labels, self.count))
+        return samples
+
+
+def _get_or_create(cls, name, help_text, labels, **kwargs):
+    labels = tuple(sorted((labels or {}).items()))
+    key = (name, labels)
+    with _lock:
+        metric = _metrics.get(key)
+        if metric is None:
+            metric = cls(name, help_text, labels=labels, **kwargs)
+            _metrics[key] = metric
+    return metric
+
+
+def counter(name, help_text, labels=None) -> Counter:
+    return _get_or_create(Counter, name, help_text, labels)
+
+
+def gauge(name, help_text, labels=None) -> Gauge:
+    return _get_or_create(Gauge, name, help_text, labels)
+
+
+def histogram(name, help_text, labels=None, buckets=DEFAULT_BUCKETS) -> Histogram:
+    return _get_or_create(Histogram, name, help_text, labels, buckets=buckets)
+
+
+def render_prometheus() -> str:
+    """Renders every registered metric in the Prometheus text exposition format."""
+    with _lock:
+        metrics = sorted(_metrics.values(), key=lambda metric: (metric.name, metric.labels))
+        lines = []
+        described = set()
+        for metric in metrics:
+            if metric.name not in described:
+                described.add(metric.name)
+                lines.append(f"# HELP {metric.name} {metric.help_text}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample_name, labels, value in metric.samples():
+                lines.append(f"{sample_name}{_label_text(labels)} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,98 @@
+import asyncio
+import inspect
+import os
+import time
+
+from services import metrics
+
+# A batch is dispatched when it reaches MAX_SIZE rows or its oldest row has
+# waited WINDOW_MS, whichever comes first.
+BATCH_MAX_SIZE = int(os.getenv("PREDICTION_BATCH_MAX_SIZE", "64"))
+BATCH_WINDOW_MS = float(os.getenv("PREDICTION_BATCH_WINDOW_MS", "2"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+
+
+class MicroBatcher:
+    """
+    Collects items submitted concurrently from request handlers and runs them
+    through `batch_fn` together. `batch_fn` takes a list of items and returns a
+    sequence with one result per item; it may be a plain or an async function.
+    """
+
+    def __init__(self, batch_fn, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_WINDOW_MS, name="prediction"):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._pending = []
+        self._flush_handle = None
+        # The event loop only holds weak references to tasks, so in-flight
+        # batches are kept here until they finish.
+        self._tasks = set()
+
+        labels = {"batcher": name}
+        self.batch_size = metrics.histogram(
+            "micro_batch_size",
+            "Number of rows per dispatched micro-batch.",
+            labels,
+            buckets=BATCH_SIZE_BUCKETS,
+        )
+        self.queue_delay = metrics.histogram(
+            "micro_batch_queue_delay_seconds",
+            "Time a row waited in the micro-batcher before dispatch.",
+            labels,
+        )
+        self.batch_errors = metrics.counter(
+            "micro_batch_errors_total",
+            "Micro-batches whose batch function raised.",
+            labels,
+        )
+
+    async def submit(self, item):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((item, future, time.perf_counter()))
+
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_wait, self._flush)
+
+        return await future
+
+    def _flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        if not self._pending:
+            return
+        batch = self._pending[: self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size :]
+        if self._pending:
+            self._flush_handle = asyncio.get_running_loop().call_soon(self._flush)
+        task = asyncio.ensure_future(self._run(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch):
+        dispatched_at = time.perf_counter()
+        self.batch_size.observe(len(batch))
+        for _, _, submitted_at in batch:
+            self.queue_delay.observe(dispatched_at - submitted_at)
+
+        try:
+            results = self.batch_fn([item for item, _, _ in batch])
+            if inspect.isawaitable(results):
+                results = await results
+            if len(results) != len(batch):
+                raise ValueError(f"Batch function returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            self.batch_errors.inc()
+            for _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future, _), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
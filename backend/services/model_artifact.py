@@ -0,0 +1,196 @@
+"""
+Memory-mappable artifact format for NumPy model arrays.
+
+An artifact is a directory holding a flat binary blob and a small JSON
+manifest describing it:
+
+    manifest.json         format version, checksum, blob name, array table
+    arrays-<digest>.bin   raw C-contiguous array data, 64-byte aligned
+
+Readers `mmap` the blob read-only and wrap slices of it with
+`np.frombuffer`, so opening an artifact costs the same regardless of its size
+and every process mapping it shares a single page-cache copy. The blob name
+embeds its checksum and the manifest is replaced last with an atomic rename,
+so a reader never pairs a manifest with a blob from another write. Writers
+go through unique temp files, so several processes may write the same
+directory; superseded blobs are only removed once they are no longer
+referenced and older than STALE_BLOB_SECONDS.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import tempfile
+import time
+
+import numpy as np
+
+ARTIFACT_FORMAT = "solarhelper-arrays"
+ARTIFACT_FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+ALIGNMENT = 64
+WRITE_CHUNK_BYTES = 64 * 1024 * 1024
+# Another writer may have renamed its blob but not yet published its manifest
+STALE_BLOB_SECONDS = 600
+
+
+class ArtifactError(ValueError):
+    pass
+
+
+def _chunks(array, chunk_bytes=WRITE_CHUNK_BYTES):
+    flat = array.reshape(-1)
+    step = max(1, chunk_bytes // max(1, array.itemsize))
+    for start in range(0, flat.size, step):
+        yield flat[start:start + step].tobytes()
+
+
+def write_artifact(directory, arrays, metadata=None) -> dict:
+    """
+    Writes `arrays` (name -> ndarray) and returns the manifest. Arrays are
+    streamed to disk in chunks, so they may be larger than memory (e.g.
+    `np.memmap`s).
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    table = {}
+    offset = 0
+    digest = hashlib.sha256()
+    fd, blob_tmp = tempfile.mkstemp(dir=directory, prefix="arrays-", suffix=".bin.tmp")
+    try:
+        with os.fdopen(fd, "wb") as file_obj:
+            for name, array in arrays.items():
+                array = np.asarray(array, order="C")
+                if array.dtype.hasobject:
+                    raise ArtifactError(f"Array '{name}' has an object dtype and cannot be mapped")
+                padding = b"\0" * (-offset % ALIGNMENT)
+                file_obj.write(padding)
+                digest.update(padding)
+                offset += len(padding)
+                table[name] = {
+                    "dtype": array.dtype.str,
+                    "shape": list(array.shape),
+                    "offset": offset,
+                    "nbytes": array.nbytes,
+                }
+                for chunk in _chunks(array):
+                    file_obj.write(chunk)
+                    digest.update(chunk)
+                offset += array.nbytes
+        # mkstemp creates the file 0600; other users on the host map it too
+        os.chmod(blob_tmp, 0o644)
+
+        checksum = digest.hexdigest()
+        blob_file = f"arrays-{checksum[:16]}.bin"
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "format_version": ARTIFACT_FORMAT_VERSION,
+            "created_at": time.time(),
+            "blob": blob_file,
+            "size": offset,
+            "checksum": f"sha256:{checksum}",
+            "arrays": table,
+            "metadata": metadata or {},
+        }
+        os.replace(blob_tmp, os.path.join(directory, blob_file))
+    except BaseException:
+        _remove(blob_tmp)
+        raise
+
+    fd, manifest_tmp = tempfile.mkstemp(dir=directory, prefix="manifest-", suffix=".json.tmp")
+    try:
+        with os.fdopen(fd, "w") as file_obj:
+            json.dump(manifest, file_obj, indent=2)
+        os.chmod(manifest_tmp, 0o644)
+        os.replace(manifest_tmp, os.path.join(directory, MANIFEST_FILE))
+    except BaseException:
+        _remove(manifest_tmp)
+        raise
+
+    remove_stale_files(directory)
+    return manifest
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def remove_stale_files(directory, max_age=STALE_BLOB_SECONDS):
+    """
+    Removes blobs the published manifest no longer references, and temp files
+    left by crashed writers, once they are older than `max_age` seconds.
+    Readers that still map an old blob keep their mapping after the unlink.
+    """
+    try:
+        current = read_manifest(directory)["blob"]
+    except (OSError, ValueError):
+        # Without a readable manifest there is no telling what is still in use
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(directory):
+        if name == current:
+            continue
+        if not (name.startswith("arrays-") or name.startswith("manifest-")) or not name.endswith((".bin", ".tmp")):
+            continue
+        path = os.path.join(directory, name)
+        try:
+            if os.stat(path).st_mtime < cutoff:
+                os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def read_manifest(directory) -> dict:
+    path = os.path.join(directory, MANIFEST_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"Artifact manifest not found at: {path}")
+    with open(path) as file_obj:
+        manifest = json.load(file_obj)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ArtifactError(f"{path} is not a {ARTIFACT_FORMAT} manifest")
+    if manifest.get("format_version") != ARTIFACT_FORMAT_VERSION:
+        raise ArtifactError(
+            f"Unsupported artifact format version {manifest.get('format_version')}, "
+            f"expected {ARTIFACT_FORMAT_VERSION}"
+        )
+    return manifest
+
+
+def open_artifact(directory, verify=True):
+    """
+    Maps the artifact read-only and returns `(arrays, manifest)`. With
+    `verify`, the blob is hashed and compared against the manifest checksum
+    before any array is handed out.
+    """
+    manifest = read_manifest(directory)
+    blob_path = os.path.join(directory, manifest["blob"])
+    try:
+        file_obj = open(blob_path, "rb")
+    except FileNotFoundError:
+        # A writer replaced the manifest and removed its old blob between the
+        # two reads; the new manifest names a blob that is still there
+        manifest = read_manifest(directory)
+        blob_path = os.path.join(directory, manifest["blob"])
+        file_obj = open(blob_path, "rb")
+    with file_obj:
+        size = os.fstat(file_obj.fileno()).st_size
+        if size != manifest["size"]:
+            raise ArtifactError(f"{blob_path} is {size} bytes, manifest expects {manifest['size']}")
+        buffer = mmap.mmap(file_obj.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    if verify:
+        checksum = f"sha256:{hashlib.sha256(buffer).hexdigest()}"
+        if checksum != manifest["checksum"]:
+            raise ArtifactError(f"Checksum mismatch for {blob_path}: {checksum} != {manifest['checksum']}")
+
+    arrays = {}
+    for name, entry in manifest["arrays"].items():
+        dtype = np.dtype(entry["dtype"])
+        count = int(np.prod(entry["shape"], dtype=np.int64))
+        array = np.frombuffer(buffer, dtype=dtype, count=count, offset=entry["offset"])
+        arrays[name] = array.reshape(entry["shape"])
+    return arrays, manifest
@@ -0,0 +1,198 @@
+import hashlib
+import logging
+import os
+import pickle
+import threading
+import time
+from dataclasses import dataclass
+
+from services.feature_transform import AffineTransform, feature_columns, fuse_transformer
+from services.model_artifact import MANIFEST_FILE, read_manifest
+from services.tree_compiler import COMPILED_MODEL_DIR, CompiledModel
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "prediction_models"))
+
+MODEL_FILE = "prediction_model.pkl"
+PREPROCESSOR_FILE = "preprocessing_inputs.pkl"
+OUTPUT_TRANSFORMER_FILE = "preprocessing_output.pkl"
+ARTIFACT_FILES = {
+    "pickle": (MODEL_FILE, PREPROCESSOR_FILE, OUTPUT_TRANSFORMER_FILE),
+    # Only the manifest is watched: it is replaced last when a new blob is written.
+    "compiled": (os.path.join(COMPILED_MODEL_DIR, MANIFEST_FILE),),
+}
+
+# "pickle" serves the sklearn/LightGBM objects; "compiled" memory-maps the
+# NumPy tree evaluator exported by `python -m services.tree_compiler`.
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "pickle")
+# Hash the mapped blob against its manifest checksum before serving it.
+VERIFY_ARTIFACT_CHECKSUM = os.getenv("MODEL_ARTIFACT_VERIFY", "1") != "0"
+
+# Seconds between checks of the artifact files for changes. 0 disables hot reload.
+RELOAD_CHECK_INTERVAL = float(os.getenv("MODEL_RELOAD_CHECK_INTERVAL", "5"))
+
+
+@dataclass(frozen=True)
+class ModelArtifacts:
+    """Immutable handle to one loaded generation of the prediction artifacts."""
+
+    model: object
+    preprocessor: object
+    output_transformer: object
+    version: str
+    loaded_at: float
+    feature_names: tuple
+    compiled: CompiledModel = None
+    # Fused NumPy equivalents of preprocessor.transform and
+    # output_transformer.inverse_transform; None when they cannot be fused.
+    input_transform: AffineTransform = None
+    output_transform: AffineTransform = None
+
+
+class ModelRegistry:
+    """
+    Loads the prediction artifacts once per process and hands out the current
+    ModelArtifacts. The artifact files are polled (mtime/size, then content hash)
+    at most every `check_interval` seconds; a changed generation is fully loaded
+    before it replaces the current one, so readers never see a partial swap.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, check_interval=RELOAD_CHECK_INTERVAL, backend=MODEL_BACKEND):
+        if backend not in ARTIFACT_FILES:
+            raise ValueError(f"Unknown model backend '{backend}', expected one of {sorted(ARTIFACT_FILES)}")
+        self.model_dir = model_dir
+        self.backend = backend
+        self.check_interval = check_interval
+        self._artifacts = None
+        self._signature = None
+        self._last_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> ModelArtifacts:
+        artifacts = self._artifacts
+        if artifacts is None:
+            with self._lock:
+                if self._artifacts is None:
+                    self._reload_locked(force=True)
+                return self._artifacts
+
+        if self.reload_due():
+            # Only one thread performs the check; everyone else keeps serving
+            # the current generation instead of queueing behind a reload.
+            if self._lock.acquire(blocking=False):
+                try:
+                    self._reload_locked(force=False)
+                except Exception as e:
+                    logger.warning("Model reload failed, keeping version %s: %s", artifacts.version[:12], e)
+                finally:
+                    self._lock.release()
+        return self._artifacts
+
+    def current(self):
+        """
+        The loaded ModelArtifacts, or None before the first load. Never loads
+        or checks for changes, so it is safe to call from the event loop.
+        """
+        return self._artifacts
+
+    def reload_due(self):
+        return (
+            self._artifacts is not None
+            and self.check_interval > 0
+            and time.monotonic() - self._last_check >= self.check_interval
+        )
+
+    def reload(self, force=True) -> ModelArtifacts:
+        with self._lock:
+            self._reload_locked(force=force)
+            return self._artifacts
+
+    def _path(self, name):
+        return os.path.join(self.model_dir, name)
+
+    def _stat_signature(self):
+        signature = []
+        for name in ARTIFACT_FILES[self.backend]:
+            path = self._path(name)
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Object file not found at: {path}")
+            stat = os.stat(path)
+            signature.append((stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _reload_locked(self, force):
+        self._last_check = time.monotonic()
+        signature = self._stat_signature()
+        if not force and signature == self._signature:
+            return
+
+        if self.backend == "compiled":
+            version, build = self._compiled_generation()
+        else:
+            version, build = self._pickle_generation()
+
+        current = self._artifacts
+        if current is not None and current.version == version:
+            # Files were touched but their content is unchanged.
+            self._signature = signature
+            return
+
+        artifacts = build(version)
+        self._artifacts = artifacts
+        self._signature = signature
+        logger.info("Loaded %s model artifacts version %s from %s", self.backend, version[:12], self.model_dir)
+
+    def _compiled_generation(self):
+        directory = self._path(COMPILED_MODEL_DIR)
+        # The manifest checksum identifies the generation without reading the blob
+        version = read_manifest(directory)["checksum"].split(":", 1)[-1]
+
+        def build(version):
+            compiled, manifest = CompiledModel.load(directory, verify=VERIFY_ARTIFACT_CHECKSUM)
+            return ModelArtifacts(
+                model=None,
+                preprocessor=None,
+                output_transformer=None,
+                version=manifest["checksum"].split(":", 1)[-1],
+                loaded_at=time.time(),
+                feature_names=tuple(compiled.feature_names),
+                compiled=compiled,
+            )
+
+        return version, build
+
+    def _pickle_generation(self):
+        payloads = {}
+        digest = hashlib.sha256()
+        for name in ARTIFACT_FILES[self.backend]:
+            with open(self._path(name), "rb") as file_obj:
+                payloads[name] = file_obj.read()
+            digest.update(payloads[name])
+
+        def build(version):
+            preprocessor = pickle.loads(payloads[PREPROCESSOR_FILE])
+            output_transformer = pickle.loads(payloads[OUTPUT_TRANSFORMER_FILE])
+            feature_names = feature_columns(preprocessor)
+            if feature_names is None:
+                raise ValueError("Preprocessor was not fitted on named columns (missing feature_names_in_)")
+            return ModelArtifacts(
+                model=pickle.loads(payloads[MODEL_FILE]),
+                preprocessor=preprocessor,
+                output_transformer=output_transformer,
+                version=version,
+                loaded_at=time.time(),
+                feature_names=feature_names,
+                input_transform=fuse_transformer(preprocessor),
+                output_transform=fuse_transformer(output_transformer),
+            )
+
+        return digest.hexdigest(), build
+
+
+registry = ModelRegistry()
+
+
+def get_artifacts() -> ModelArtifacts:
+    return registry.get()
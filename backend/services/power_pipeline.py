@@ -1,110 +1,161 @@
+import logging
 import os
 import pickle
+import random
 import sys
+import time
 import pandas as pd
-import sklearn
-import lightgbm as lgb
 import numpy as np
 
+from services import metrics
+from services.model_registry import get_artifacts, registry
+
+logger = logging.getLogger(__name__)
+
+# Boosting iterations evaluated in fast mode; see benchmarks/fast_mode_report.py
+# for the latency/accuracy trade-off of other values.
+FAST_MODE_ITERATIONS = int(os.getenv("FAST_MODE_ITERATIONS", "30"))
+
+# Fraction of predict calls whose stages are logged in detail (0 = none, 1 = all).
+# Stage durations are always recorded in the prediction_stage_seconds histogram.
+LOG_SAMPLE_RATE = float(os.getenv("PREDICTION_LOG_SAMPLE_RATE", "0"))
+
+STAGES = ("load", "transform", "predict", "inverse_transform")
+STAGE_SECONDS = {
+    stage: metrics.histogram(
+        "prediction_stage_seconds",
+        "Time spent in each prediction pipeline stage.",
+        {"stage": stage},
+    )
+    for stage in STAGES
+}
+PREDICTION_ROWS = metrics.histogram(
+    "prediction_rows",
+    "Rows per PredictPipeline.predict_batch call.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128, 256, 1024, 4096, 16384),
+)
+PREDICTION_ERRORS = {
+    stage: metrics.counter(
+        "prediction_errors_total",
+        "Prediction pipeline failures by stage.",
+        {"stage": stage},
+    )
+    for stage in STAGES
+}
+
+
 class PredictPipeline:
     def __init__(self):
-        print("--- Library Versions ---")
-        print(f"Python: {sys.version}")
-        print(f"Pandas: {pd.__version__}")
-        print(f"Scikit-learn: {sklearn.__version__}")
-        print(f"LightGBM: {lgb.__version__}")
-        print(f"Numpy: {np.__version__}")
-        print("-----------------------")
-        print("Pipeline initialized")
-
-    def predict(self, features):
-        model = None
-        preprocessor = None
-        output_transformer = None
-        try:
-            # Ensure the path to the models directory is absolute and correctly resolved
-            SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-            MODEL_DIR = os.path.abspath(os.path.join(SCRIPT_DIR, '..', 'prediction_models'))
+        versions = [f"Python {sys.version.split()[0]}", f"Pandas {pd.__version__}", f"Numpy {np.__version__}"]
+        if registry.backend == "pickle":
+            # The compiled backend predicts without sklearn/LightGBM installed
+            import sklearn
+            import lightgbm as lgb
 
-            model_path = os.path.join(MODEL_DIR, "prediction_model.pkl")
-            preprocessor_path = os.path.join(MODEL_DIR, 'preprocessing_inputs.pkl')
-            output_transformer_path = os.path.join(MODEL_DIR, 'preprocessing_output.pkl')
+            versions += [f"Scikit-learn {sklearn.__version__}", f"LightGBM {lgb.__version__}"]
+        logger.info("Pipeline initialized (model backend %s; %s)", registry.backend, ", ".join(versions))
 
-            print(f"Attempting to load model from: {model_path}")
-            model = self.load_object(file_path=model_path)
-            print(f"Successfully loaded model: {type(model)}")
+    def predict(self, features, num_iterations=None):
+        return self.predict_batch(features, num_iterations=num_iterations)[0]
 
-            print(f"Attempting to load preprocessor from: {preprocessor_path}")
-            preprocessor = self.load_object(file_path=preprocessor_path)
-            print(f"Successfully loaded preprocessor: {type(preprocessor)}")
+    @property
+    def feature_names(self):
+        return get_artifacts().feature_names
 
-            print(f"Attempting to load output transformer from: {output_transformer_path}")
-            output_transformer = self.load_object(file_path=output_transformer_path)
-            print(f"Successfully loaded output transformer: {type(output_transformer)}")
+    @property
+    def model_version(self):
+        return get_artifacts().version
+
+    def predict_batch(self, features, num_iterations=None):
+        """
+        Runs one transform / predict / inverse_transform pass over every row of
+        `features` and returns a 1-D array with one predicted power per row.
+        `features` is a DataFrame or a NumPy array in `feature_names` order.
+        `num_iterations` evaluates only the first K boosting iterations (fast
+        mode); None uses the full ensemble.
+        """
+        verbose = LOG_SAMPLE_RATE > 0 and random.random() < LOG_SAMPLE_RATE
+        timings = {}
+        stage = "load"
+        started = time.perf_counter()
+        try:
+            # Artifacts are loaded once per process and hot-reloaded by the registry
+            artifacts = get_artifacts()
+            started = self._record(timings, stage, started)
+            PREDICTION_ROWS.observe(features.shape[0])
 
-            print(f"Input features shape: {features.shape}")
-            print("Attempting to transform features...")
-            transformed_features = preprocessor.transform(features)
-            print(f"Successfully transformed features. Shape: {transformed_features.shape}")
+            if artifacts.compiled is not None:
+                # Scaling and inverse scaling are fused into the compiled trees
+                stage = "predict"
+                predictions = artifacts.compiled.predict(features, num_trees=num_iterations)
+                self._record(timings, stage, started)
+                if verbose:
+                    self._log_sample(artifacts, features, timings)
+                return predictions
 
-            print("Attempting to predict...")
-            preds = model.predict(transformed_features)
-            print(f"Successfully predicted. Shape: {preds.shape}")
+            stage = "transform"
+            if artifacts.input_transform is not None:
+                if hasattr(features, "columns"):
+                    features = features[list(artifacts.feature_names)].to_numpy(dtype=np.float64)
+                transformed_features = artifacts.input_transform.apply(features)
+            else:
+                if not hasattr(features, "columns"):
+                    features = pd.DataFrame(features, columns=artifacts.feature_names)
+                transformed_features = artifacts.preprocessor.transform(features)
+            started = self._record(timings, stage, started)
 
-            print("Attempting to inverse transform predictions...")
+            stage = "predict"
+            preds = artifacts.model.predict(transformed_features, num_iteration=num_iterations)
+            started = self._record(timings, stage, started)
+
+            stage = "inverse_transform"
             # Ensure preds is 2D for inverse_transform
             if preds.ndim == 1:
                 preds = preds.reshape(-1, 1)
-            result = output_transformer.inverse_transform(preds)
-            print(f"Successfully inverse transformed. Shape: {result.shape}")
+            if artifacts.output_transform is not None:
+                result = artifacts.output_transform.invert(preds)
+            else:
+                result = artifacts.output_transformer.inverse_transform(preds)
+            self._record(timings, stage, started)
 
-            final_prediction = result[0][0]
-            print(f"Final prediction: {final_prediction}")
-            return final_prediction
+            predictions = result[:, 0]
+            if verbose:
+                self._log_sample(artifacts, features, timings)
+            return predictions
 
         except FileNotFoundError as e:
-            print(f"ERROR: File not found - {e}")
+            PREDICTION_ERRORS[stage].inc()
+            logger.error("Prediction failed: file not found - %s", e)
             raise
         except pickle.UnpicklingError as e:
-            print(f"ERROR: Failed to unpickle file. It might be corrupted or incompatible. - {e}")
+            PREDICTION_ERRORS[stage].inc()
+            logger.error("Prediction failed: could not unpickle model artifacts, they might be corrupted or incompatible - %s", e)
             raise
         except ImportError as e:
-             print(f"ERROR: Import error during unpickling. Check library versions. - {e}")
-             raise
-        except AttributeError as e:
-            print(f"ERROR: Attribute error during unpickling or prediction. Check model/preprocessor compatibility. - {e}")
-            if model is None: print("Model object might be None.")
-            if preprocessor is None: print("Preprocessor object might be None.")
-            if output_transformer is None: print("Output transformer object might be None.")
+            PREDICTION_ERRORS[stage].inc()
+            logger.error("Prediction failed: import error while unpickling, check library versions - %s", e)
             raise
         except Exception as e:
-            print(f"ERROR: An unexpected error occurred in predict pipeline: {type(e).__name__} - {e}")
-            if 'transform' in str(e).lower():
-                 print("Error likely occurred during preprocessor.transform()")
-            elif 'predict' in str(e).lower():
-                 print("Error likely occurred during model.predict()")
-            elif 'inverse_transform' in str(e).lower():
-                 print("Error likely occurred during output_transformer.inverse_transform()")
+            PREDICTION_ERRORS[stage].inc()
+            logger.error("Prediction failed during %s stage: %s - %s", stage, type(e).__name__, e)
             raise
 
-    def load_object(self, file_path):
-        if not os.path.exists(file_path):
-            raise FileNotFoundError(f"Object file not found at: {file_path}")
-        print(f"Loading object from: {file_path}")
-        try:
-            with open(file_path, "rb") as file_obj:
-                obj = pickle.load(file_obj)
-                print(f"Successfully loaded object of type: {type(obj)}")
-                return obj
-        except pickle.UnpicklingError as e:
-            print(f"ERROR during unpickling {file_path}: {e}. File might be corrupt or incompatible.")
-            raise
-        except ImportError as e:
-             print(f"ERROR during unpickling {file_path} due to missing class/module: {e}")
-             raise
-        except Exception as e:
-            print(f"ERROR: Unexpected error loading object from {file_path}: {type(e).__name__} - {e}")
-            raise
+    @staticmethod
+    def _record(timings, stage, started):
+        now = time.perf_counter()
+        timings[stage] = now - started
+        STAGE_SECONDS[stage].observe(timings[stage])
+        return now
+
+    @staticmethod
+    def _log_sample(artifacts, features, timings):
+        logger.info(
+            "Predicted %d rows with %s model %s: %s",
+            features.shape[0],
+            registry.backend,
+            artifacts.version[:12],
+            ", ".join(f"{stage}={seconds * 1e3:.3f}ms" for stage, seconds in timings.items()),
+        )
 
 
 if __name__ == "__main__":
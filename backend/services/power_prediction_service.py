@@ -1,67 +1,26 @@
 from fastapi import HTTPException
-import os
-import pickle
-import pandas as pd
 import traceback 
 
-
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-MODEL_DIR = os.path.join(BASE_DIR, '..', 'prediction_models')
-
-
-def load_object(file_path):
-    if not os.path.exists(file_path):
-        raise FileNotFoundError(f"Model or preprocessor file not found at: {file_path}")
-    try:
-        print(f"Attempting to load: {file_path}")  
-        with open(file_path, "rb") as file_obj:
-            loaded_obj = pickle.load(file_obj)
-        print(f"Successfully loaded: {file_path}")  
-        return loaded_obj
-    except Exception as e:
-        print(f"Error loading object from {file_path}: {e}")
-        raise
+from services.prediction_engine import engine
 
 
 def predict(features) -> float:
     try:
-        preprocessor_path = os.path.join(MODEL_DIR, 'preprocessing_inputs.pkl')  
-        output_transformer_path = os.path.join(MODEL_DIR, 'preprocessing_output.pkl') 
-        model_path = os.path.join(MODEL_DIR, "prediction_model.pkl")
-
-
-        model = load_object(file_path=model_path)
-
-        preprocessor = load_object(file_path=preprocessor_path)
-
-        output_transformer = load_object(file_path=output_transformer_path)
-
-        # Convert input features to DataFrame
-        if isinstance(features, dict):
-            features_dict = features
-        elif hasattr(features, "model_dump"):  
-            features_dict = features.model_dump()
-        else:
+        # Accept plain dicts or Pydantic feature models
+        if not isinstance(features, dict) and not hasattr(features, "model_dump"):
             raise HTTPException(
                 status_code=400,
                 detail="Invalid features input: must be dict or model with model_dump()"
             )
-        features_df = pd.DataFrame([features_dict])
-        print(features_df.head())  # Log head for confirmation
 
-        # Preprocess features
-        processed_X = preprocessor.transform(features_df)
-
-        # Predict using the model
-        preds_scaled = model.predict(processed_X)
-
-        # Inverse transform the prediction
-        result_value_array = output_transformer.inverse_transform(preds_scaled.reshape(-1, 1))
-        result_value = float(result_value_array[0][0])
+        # Shares the model, cache and metrics with the power routes
+        result_value = float(engine.predict_sync([features])[0])
 
         return {"predicted_power":result_value}
 
+    except HTTPException:
+        raise
+
     except FileNotFoundError as e:
         print(f"Error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
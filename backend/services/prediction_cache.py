@@ -0,0 +1,120 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from services import metrics
+
+PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "4096"))
+PREDICTION_CACHE_TTL = float(os.getenv("PREDICTION_CACHE_TTL", "3600"))
+
+# Rows whose features round to the same multiples of these steps share a
+# cached prediction. Features not listed here use DEFAULT_QUANTIZATION_STEP.
+DEFAULT_QUANTIZATION = {
+    "temperature_2_m_above_gnd": 0.1,
+    "relative_humidity_2_m_above_gnd": 1.0,
+    "mean_sea_level_pressure_MSL": 0.5,
+    "total_precipitation_sfc": 0.05,
+    "snowfall_amount_sfc": 0.05,
+    "total_cloud_cover_sfc": 1.0,
+    "high_cloud_cover_high_cld_lay": 1.0,
+    "medium_cloud_cover_mid_cld_lay": 1.0,
+    "low_cloud_cover_low_cld_lay": 1.0,
+    "shortwave_radiation_backwards_sfc": 1.0,
+    "wind_speed_10_m_above_gnd": 0.1,
+    "wind_direction_10_m_above_gnd": 1.0,
+    "wind_speed_80_m_above_gnd": 0.1,
+    "wind_direction_80_m_above_gnd": 1.0,
+    "wind_speed_900_mb": 0.1,
+    "wind_direction_900_mb": 1.0,
+    "wind_gust_10_m_above_gnd": 0.1,
+    "angle_of_incidence": 0.5,
+    "zenith": 0.5,
+    "azimuth": 0.5,
+}
+DEFAULT_QUANTIZATION_STEP = 0.01
+
+
+def _quantization_from_env():
+    quantization = dict(DEFAULT_QUANTIZATION)
+    overrides = os.getenv("PREDICTION_CACHE_QUANTIZATION")
+    if overrides:
+        # e.g. PREDICTION_CACHE_QUANTIZATION='{"temperature_2_m_above_gnd": 0.5}'
+        quantization.update({name: float(step) for name, step in json.loads(overrides).items()})
+    return quantization
+
+
+class PredictionCache:
+    """
+    LRU cache of predicted power keyed by quantized feature rows and the model
+    version, so a hot-reloaded model never serves predictions from the old one.
+    Entries expire `ttl` seconds after they were stored.
+    """
+
+    def __init__(self, max_size=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL, quantization=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.quantization = quantization if quantization is not None else _quantization_from_env()
+        self._entries = OrderedDict()
+        self._steps = {}
+        self._lock = threading.Lock()
+
+        self.hits = metrics.counter("prediction_cache_hits_total", "Predictions served from the cache.")
+        self.misses = metrics.counter("prediction_cache_misses_total", "Prediction cache lookups that missed.")
+        self.evictions = metrics.counter("prediction_cache_evictions_total", "Entries evicted by LRU or TTL.")
+        self.size = metrics.gauge("prediction_cache_entries", "Entries currently held in the prediction cache.")
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def _steps_for(self, columns):
+        steps = self._steps.get(columns)
+        if steps is None:
+            steps = np.array(
+                [self.quantization.get(column, DEFAULT_QUANTIZATION_STEP) for column in columns],
+                dtype=np.float64,
+            )
+            self._steps[columns] = steps
+        return steps
+
+    def keys(self, features, columns, version):
+        """Returns one hashable key per row of the (n_rows, n_columns) `features` array."""
+        quantized = np.rint(features / self._steps_for(tuple(columns))).astype(np.int64)
+        return [(version, row.tobytes()) for row in quantized]
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits.inc()
+                    return value
+                del self._entries[key]
+                self.evictions.inc()
+                self.size.set(len(self._entries))
+        self.misses.inc()
+        return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions.inc()
+            self.size.set(len(self._entries))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size.set(0)
+
+
+prediction_cache = PredictionCache()
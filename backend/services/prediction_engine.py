@@ -0,0 +1,201 @@
+"""
+Single entry point for power predictions.
+
+Every caller (the power routes, services.power_prediction_service and the
+startup warmup) goes through `engine`, so the prediction cache, the
+micro-batcher, the inference executor and the metrics apply the same way
+everywhere and the model is loaded once per process.
+
+The core API is batched: `predict_matrix` takes an (n, n_features) array in
+`engine.feature_names` order and returns n predictions. `predict_many` and
+`predict_one` build that matrix from request features; `predict_one` goes
+through the micro-batcher so concurrent single-row requests share a call.
+
+Loading and hot-reloading the model read, hash and unpickle files, so they
+never run on the event loop: async callers `await engine.ready()` before
+using `feature_names` or `model_version`, which only read the loaded
+generation.
+"""
+
+import asyncio
+import os
+import time
+from functools import partial
+
+import numpy as np
+
+from models.requests import PowerPredictionFeatures
+from services import metrics
+from services.feature_transform import features_to_array
+from services.inference_executor import inference_executor, predict_matrix
+from services.micro_batcher import MicroBatcher
+from services.model_registry import registry
+from services.power_pipeline import FAST_MODE_ITERATIONS, PredictPipeline
+from services.prediction_cache import prediction_cache
+
+# Routes that use fast mode unless a request sets `fast` explicitly,
+# e.g. FAST_MODE_ENDPOINTS=/power_prediction/batch
+FAST_MODE_ENDPOINTS = {
+    path.strip()
+    for path in os.getenv("FAST_MODE_ENDPOINTS", "").split(",")
+    if path.strip()
+}
+
+ENTRY_POINTS = ("single", "batch", "sync")
+ENGINE_SECONDS = {
+    entry: metrics.histogram(
+        "prediction_engine_seconds",
+        "End-to-end prediction engine latency, including cache and queueing.",
+        {"entry": entry},
+    )
+    for entry in ENTRY_POINTS
+}
+
+
+def resolve_iterations(fast, endpoint):
+    if fast is None:
+        fast = endpoint in FAST_MODE_ENDPOINTS
+    return FAST_MODE_ITERATIONS if fast else None
+
+
+class PredictionEngine:
+    def __init__(self, executor=inference_executor, cache=prediction_cache):
+        self.executor = executor
+        self.cache = cache
+        # Model artifacts are cached by services.model_registry
+        self.pipeline = PredictPipeline()
+        self._reload_check = None
+        # Concurrent single-row predictions are coalesced into one vectorized
+        # call, with a separate batcher per ensemble size so modes never mix
+        self.batchers = {
+            None: MicroBatcher(self._predict_rows),
+            FAST_MODE_ITERATIONS: MicroBatcher(
+                partial(self._predict_rows, num_iterations=FAST_MODE_ITERATIONS),
+                name="prediction_fast",
+            ),
+        }
+
+    async def ready(self):
+        """
+        Returns the current ModelArtifacts, loading them in a worker thread if
+        warmup has not yet. A due hot-reload check is started in a worker
+        thread too; this call keeps serving the current generation meanwhile.
+        """
+        artifacts = registry.current()
+        if artifacts is None:
+            return await asyncio.to_thread(registry.get)
+        if registry.reload_due() and (self._reload_check is None or self._reload_check.done()):
+            self._reload_check = asyncio.ensure_future(asyncio.to_thread(registry.get))
+        return artifacts
+
+    def _artifacts(self):
+        artifacts = registry.current()
+        if artifacts is not None:
+            return artifacts
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            # Scripts and worker threads may load synchronously
+            return registry.get()
+        raise RuntimeError("Model artifacts are not loaded yet; await engine.ready() first")
+
+    @property
+    def feature_names(self):
+        return self._artifacts().feature_names
+
+    @property
+    def model_version(self):
+        return self._artifacts().version
+
+    def to_matrix(self, features_list):
+        """Stacks PowerPredictionFeatures models or dicts into a feature matrix."""
+        return features_to_array(features_list, self.feature_names)
+
+    async def _predict_rows(self, rows, num_iterations=None):
+        return await self.executor.run(predict_matrix, np.vstack(rows), num_iterations)
+
+    def _cache_lookup(self, features, num_iterations):
+        """Returns `(keys, preds, missing)`; `preds` is NaN where the cache missed."""
+        version = (self.model_version, num_iterations)
+        keys = self.cache.keys(features, self.feature_names, version)
+        preds = np.array([self.cache.get(key) for key in keys], dtype=np.float64)
+        return keys, preds, np.flatnonzero(np.isnan(preds))
+
+    def _cache_store(self, keys, preds, missing):
+        for index in missing:
+            self.cache.put(keys[index], preds[index])
+
+    async def predict_matrix(self, features, use_cache=True, num_iterations=None) -> np.ndarray:
+        """Predicts every row of `features` in one executor call, skipping cached rows."""
+        started = time.perf_counter()
+        try:
+            await self.ready()
+            if not (use_cache and self.cache.enabled):
+                return await self.executor.run(predict_matrix, features, num_iterations)
+
+            keys, preds, missing = self._cache_lookup(features, num_iterations)
+            if missing.size:
+                preds[missing] = await self.executor.run(
+                    predict_matrix, features[missing], num_iterations
+                )
+                self._cache_store(keys, preds, missing)
+            return preds
+        finally:
+            ENGINE_SECONDS["batch"].observe(time.perf_counter() - started)
+
+    async def predict_many(self, features_list, use_cache=True, num_iterations=None) -> np.ndarray:
+        await self.ready()
+        return await self.predict_matrix(self.to_matrix(features_list), use_cache, num_iterations)
+
+    async def predict_one(self, features, use_cache=True, num_iterations=None) -> float:
+        """Predicts one row through the cache and the micro-batcher."""
+        started = time.perf_counter()
+        try:
+            await self.ready()
+            batcher = self.batchers[num_iterations]
+            row = self.to_matrix([features])
+            if not (use_cache and self.cache.enabled):
+                return await batcher.submit(row[0])
+
+            keys, preds, missing = self._cache_lookup(row, num_iterations)
+            if missing.size:
+                preds[0] = await batcher.submit(row[0])
+                self._cache_store(keys, preds, missing)
+            return float(preds[0])
+        finally:
+            ENGINE_SECONDS["single"].observe(time.perf_counter() - started)
+
+    def predict_sync(self, features_list, use_cache=True, num_iterations=None) -> np.ndarray:
+        """
+        Blocking variant for callers outside the event loop. Uses the same
+        cache as the async entry points but predicts in the calling thread.
+        """
+        started = time.perf_counter()
+        try:
+            features = self.to_matrix(features_list)
+            if not (use_cache and self.cache.enabled):
+                return self.pipeline.predict_batch(features, num_iterations=num_iterations)
+
+            keys, preds, missing = self._cache_lookup(features, num_iterations)
+            if missing.size:
+                preds[missing] = self.pipeline.predict_batch(
+                    features[missing], num_iterations=num_iterations
+                )
+                self._cache_store(keys, preds, missing)
+            return preds
+        finally:
+            ENGINE_SECONDS["sync"].observe(time.perf_counter() - started)
+
+    async def warm(self):
+        # One dummy batch per worker so process-pool workers load their models too
+        await self.ready()
+        features = self.to_matrix([PowerPredictionFeatures()] * 8)
+        await asyncio.gather(
+            *[
+                self.executor.run(predict_matrix, features)
+                for _ in range(self.executor.workers)
+            ]
+        )
+
+
+engine = PredictionEngine()
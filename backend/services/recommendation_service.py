@@ -1,4 +1,5 @@
 import json
+import threading
 import time
 import os
 import re
@@ -74,11 +75,22 @@ def setup_rag_retriever(force_recreate=False):
     # Return retriever with slightly more context if available
     return vectorstore.as_retriever(search_kwargs={"k": 5})
 
-try:
-    retriever = setup_rag_retriever()
-except Exception as e:
-    print(f"Fatal Error setting up RAG retriever for recommendations: {e}")
-    retriever = None # Ensure retriever is None if setup fails
+retriever = None
+_retriever_attempted = False
+_retriever_lock = threading.Lock()
+
+def init_retriever():
+    """Builds the retriever once; called by the startup warmup or the first recommendation request."""
+    global retriever, _retriever_attempted
+    with _retriever_lock:
+        if not _retriever_attempted:
+            _retriever_attempted = True
+            try:
+                retriever = setup_rag_retriever()
+            except Exception as e:
+                print(f"Fatal Error setting up RAG retriever for recommendations: {e}")
+                retriever = None # Ensure retriever is None if setup fails
+    return retriever
 
 # --- End RAG Setup ---
 
@@ -98,6 +110,7 @@ def parse_currency(value_str: str) -> Optional[float]:
 
 def generate_recommendation(request: RecommendationRequest) -> SolarRecommendation:
     start_time = time.time()
+    retriever = init_retriever()
     if retriever is None:
         raise HTTPException(status_code=500, detail="Recommendation service RAG retriever not initialized.")
 
@@ -0,0 +1,58 @@
+import asyncio
+
+from services import metrics
+
+
+def _consume_exception(task):
+    # Keep asyncio from logging "exception was never retrieved" when every
+    # caller waiting on the task was cancelled first.
+    if not task.cancelled():
+        task.exception()
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent async calls by key: the first caller for a key
+    starts `fn()` as a task and later callers await that same task until it
+    finishes. The task is shielded, so a caller that is cancelled (e.g. a
+    client disconnect) does not cancel the work for everyone else.
+    """
+
+    def __init__(self, name):
+        self._calls = {}
+
+        labels = {"group": name}
+        self.coalesced = metrics.counter(
+            "single_flight_coalesced_total",
+            "Calls that joined an in-flight call instead of starting their own.",
+            labels,
+        )
+        self.in_flight = metrics.gauge(
+            "single_flight_in_flight",
+            "Distinct keys with a call currently in flight.",
+            labels,
+        )
+
+    def _finished(self, key, task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+            self.in_flight.set(len(self._calls))
+        _consume_exception(task)
+
+    def __contains__(self, key):
+        return key in self._calls
+
+    def start(self, key, fn):
+        """Returns the in-flight task for `key`, starting `fn()` if there is none."""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            self.in_flight.set(len(self._calls))
+            task.add_done_callback(lambda done: self._finished(key, done))
+        else:
+            self.coalesced.inc()
+        return task
+
+    async def do(self, key, fn):
+        return await asyncio.shield(self.start(key, fn))
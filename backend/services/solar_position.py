@@ -0,0 +1,178 @@
+"""
+Vectorized solar geometry for the model's zenith, azimuth and
+angle_of_incidence features.
+
+Implements the NOAA solar position algorithm (the one behind the NOAA solar
+calculator spreadsheets, after Meeus), which is accurate to about 0.01 deg
+for dates between 1800 and 2100. Every function broadcasts over NumPy arrays,
+so a full forecast horizon for many sites is computed in one pass.
+
+Angles are in degrees. Azimuths are measured clockwise from north, as in the
+training data. Check against the NREL SPA reference point with:
+
+    cd backend
+    python -m services.solar_position
+"""
+
+import os
+
+import numpy as np
+
+# Panel orientation used for angle_of_incidence when a request does not set
+# one. The training data matches a 45 deg tilt facing due south.
+SOLAR_PANEL_TILT = float(os.getenv("SOLAR_PANEL_TILT", "45"))
+SOLAR_PANEL_AZIMUTH = float(os.getenv("SOLAR_PANEL_AZIMUTH", "180"))
+
+UNIX_EPOCH_JULIAN_DAY = 2440587.5
+J2000_JULIAN_DAY = 2451545.0
+
+
+def to_datetime64(times):
+    """Converts UTC timestamps (ISO strings or datetime64) to a datetime64[s] array."""
+    return np.asarray(times, dtype="datetime64[s]")
+
+
+def _refraction(elevation):
+    """Atmospheric refraction correction in degrees, for standard conditions."""
+    elevation = np.asarray(elevation, dtype=np.float64)
+    tan_e = np.tan(np.radians(elevation))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        arcseconds = np.select(
+            [
+                elevation > 85,
+                elevation > 5,
+                elevation > -0.575,
+            ],
+            [
+                0.0,
+                58.1 / tan_e - 0.07 / tan_e**3 + 0.000086 / tan_e**5,
+                1735 + elevation * (-518.2 + elevation * (103.4 + elevation * (-12.79 + elevation * 0.711))),
+            ],
+            default=-20.772 / tan_e,
+        )
+    return arcseconds / 3600
+
+
+def sun_ephemeris(times):
+    """
+    Location-independent part of the algorithm: returns `(seconds,
+    declination, equation_of_time)` for UTC `times`, with the declination in
+    radians and the equation of time in minutes. Compute it once to place
+    the same timestamps at many locations.
+    """
+    seconds = to_datetime64(times).astype(np.int64).astype(np.float64)
+    jc = (seconds / 86400 + UNIX_EPOCH_JULIAN_DAY - J2000_JULIAN_DAY) / 36525
+
+    mean_longitude = np.mod(280.46646 + jc * (36000.76983 + jc * 0.0003032), 360)
+    mean_anomaly = np.radians(357.52911 + jc * (35999.05029 - 0.0001537 * jc))
+    eccentricity = 0.016708634 - jc * (0.000042037 + 0.0000001267 * jc)
+    equation_of_center = (
+        np.sin(mean_anomaly) * (1.914602 - jc * (0.004817 + 0.000014 * jc))
+        + np.sin(2 * mean_anomaly) * (0.019993 - 0.000101 * jc)
+        + np.sin(3 * mean_anomaly) * 0.000289
+    )
+    omega = np.radians(125.04 - 1934.136 * jc)
+    apparent_longitude = np.radians(mean_longitude + equation_of_center - 0.00569 - 0.00478 * np.sin(omega))
+    mean_obliquity = 23 + (26 + (21.448 - jc * (46.815 + jc * (0.00059 - jc * 0.001813))) / 60) / 60
+    obliquity = np.radians(mean_obliquity + 0.00256 * np.cos(omega))
+    declination = np.arcsin(np.sin(obliquity) * np.sin(apparent_longitude))
+
+    y = np.tan(obliquity / 2) ** 2
+    l0 = np.radians(mean_longitude)
+    equation_of_time = 4 * np.degrees(
+        y * np.sin(2 * l0)
+        - 2 * eccentricity * np.sin(mean_anomaly)
+        + 4 * eccentricity * y * np.sin(mean_anomaly) * np.cos(2 * l0)
+        - 0.5 * y**2 * np.sin(4 * l0)
+        - 1.25 * eccentricity**2 * np.sin(2 * mean_anomaly)
+    )
+    return seconds, declination, equation_of_time
+
+
+def solar_position(times, latitude, longitude, refraction=True, ephemeris=None):
+    """
+    Returns `(zenith, azimuth)` for UTC `times` at `latitude`/`longitude`.
+    All three inputs broadcast against each other, e.g. times of shape
+    (n_hours,) with coordinates of shape (n_sites, 1) give (n_sites, n_hours).
+    With `refraction`, the zenith is the apparent one. `ephemeris` is an
+    optional precomputed `sun_ephemeris(times)`.
+    """
+    seconds, declination, equation_of_time = sun_ephemeris(times) if ephemeris is None else ephemeris
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+
+    minutes_utc = np.mod(seconds, 86400) / 60
+    true_solar_time = np.mod(minutes_utc + equation_of_time + 4 * longitude, 1440)
+    hour_angle = np.radians(true_solar_time / 4 - 180)
+
+    lat = np.radians(latitude)
+    cos_zenith = np.sin(lat) * np.sin(declination) + np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+    zenith = np.degrees(np.arccos(np.clip(cos_zenith, -1, 1)))
+    azimuth = np.mod(
+        np.degrees(
+            np.arctan2(
+                np.sin(hour_angle),
+                np.cos(hour_angle) * np.sin(lat) - np.tan(declination) * np.cos(lat),
+            )
+        )
+        + 180,
+        360,
+    )
+
+    if refraction:
+        zenith = zenith - _refraction(90 - zenith)
+    return zenith, azimuth
+
+
+def angle_of_incidence(zenith, azimuth, tilt=SOLAR_PANEL_TILT, panel_azimuth=SOLAR_PANEL_AZIMUTH):
+    """Angle between the sun and the normal of a panel with the given tilt and azimuth."""
+    zenith = np.radians(zenith)
+    tilt = np.radians(tilt)
+    cos_aoi = np.cos(zenith) * np.cos(tilt) + np.sin(zenith) * np.sin(tilt) * np.cos(
+        np.radians(np.asarray(azimuth) - np.asarray(panel_azimuth))
+    )
+    return np.degrees(np.arccos(np.clip(cos_aoi, -1, 1)))
+
+
+def solar_geometry(times, latitude, longitude, tilt=None, panel_azimuth=None, ephemeris=None):
+    """Returns `(zenith, azimuth, angle_of_incidence)`, using the default panel for unset values."""
+    zenith, azimuth = solar_position(times, latitude, longitude, ephemeris=ephemeris)
+    aoi = angle_of_incidence(
+        zenith,
+        azimuth,
+        SOLAR_PANEL_TILT if tilt is None else tilt,
+        SOLAR_PANEL_AZIMUTH if panel_azimuth is None else panel_azimuth,
+    )
+    return zenith, azimuth, aoi
+
+
+# NREL SPA reference (Reda & Andreas 2004, Table A4.1): 2003-10-17 12:30:30
+# local time at UTC-7, with delta T = 67 s. SPA is accurate to 0.0003 deg; the
+# NOAA algorithm is expected to agree to within a few hundredths of a degree.
+SPA_REFERENCE = {
+    "time": "2003-10-17T19:30:30",
+    "latitude": 39.742476,
+    "longitude": -105.1786,
+    "zenith": 50.11162,
+    "azimuth": 194.34024,
+}
+
+
+def verify(tolerance=0.05):
+    zenith, azimuth = solar_position(
+        SPA_REFERENCE["time"],
+        SPA_REFERENCE["latitude"],
+        SPA_REFERENCE["longitude"],
+    )
+    errors = {
+        "zenith": float(zenith - SPA_REFERENCE["zenith"]),
+        "azimuth": float(azimuth - SPA_REFERENCE["azimuth"]),
+    }
+    print(f"Zenith {float(zenith):.5f} (SPA {SPA_REFERENCE['zenith']}), azimuth {float(azimuth):.5f} (SPA {SPA_REFERENCE['azimuth']})")
+    if max(abs(error) for error in errors.values()) > tolerance:
+        raise AssertionError(f"Solar position differs from the SPA reference by more than {tolerance} deg: {errors}")
+    return errors
+
+
+if __name__ == "__main__":
+    verify()
@@ -0,0 +1,244 @@
+"""
+Compiles the pickled LightGBM regressor and its two StandardScalers into flat
+node arrays evaluated with NumPy only.
+
+Both scalers are folded into the trees: split thresholds are mapped back from
+the scaled input space to raw feature units, and leaf values are multiplied by
+the output scale with the output mean added once as a bias. The compiled
+model therefore takes raw feature rows and returns predicted power directly.
+
+Run `python -m services.tree_compiler` from the backend directory to export
+`prediction_models/compiled_model/` (see services.model_artifact) and verify
+it against the pickled pipeline.
+"""
+
+import os
+
+import numpy as np
+
+from services.model_artifact import open_artifact, write_artifact
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_DIR = os.path.abspath(os.path.join(BASE_DIR, "..", "prediction_models"))
+COMPILED_MODEL_DIR = "compiled_model"
+VERIFICATION_DATA_PATH = os.path.abspath(os.path.join(BASE_DIR, "..", "context", "spg.xls"))
+
+# Objectives whose prediction is the raw sum of leaf values.
+IDENTITY_OBJECTIVES = {"regression", "regression_l1", "huber", "fair", "quantile", "mape"}
+# Rows evaluated per pass; the cursor arrays are chunk_rows x num_trees
+PREDICT_CHUNK_ROWS = int(os.getenv("COMPILED_PREDICT_CHUNK_ROWS", "4096"))
+
+
+class CompiledModel:
+    """
+    Array-backed tree ensemble. The children of an internal node are stored in
+    adjacent slots (`child[i]` is the left one, `child[i] + 1` the right one)
+    and leaves point to themselves with an infinite threshold, so all rows can
+    be advanced through all trees at once without masking.
+    """
+
+    def __init__(self, feature_names, split_feature, threshold, child, leaf_value,
+                 tree_roots, max_depth, missing_fill, bias):
+        self.feature_names = [str(name) for name in feature_names]
+        self.split_feature = np.asarray(split_feature, dtype=np.intp)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.child = np.asarray(child, dtype=np.intp)
+        self.leaf_value = np.asarray(leaf_value, dtype=np.float64)
+        self.tree_roots = np.asarray(tree_roots, dtype=np.intp)
+        self.max_depth = int(max_depth)
+        self.missing_fill = np.asarray(missing_fill, dtype=np.float64)
+        self.bias = float(bias)
+
+    @property
+    def num_trees(self):
+        return len(self.tree_roots)
+
+    def _as_matrix(self, features):
+        if hasattr(features, "columns"):
+            features = features[self.feature_names].to_numpy(dtype=np.float64)
+        X = np.asarray(features, dtype=np.float64)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        if X.shape[1] != len(self.feature_names):
+            raise ValueError(f"Expected {len(self.feature_names)} features, got {X.shape[1]}")
+        nan_mask = np.isnan(X)
+        if nan_mask.any():
+            X = np.where(nan_mask, self.missing_fill, X)
+        return X
+
+    def _predict_chunk(self, X, roots):
+        n_rows, n_features = X.shape
+        # One flat (row, tree) cursor array; row_offset locates each row in X.ravel()
+        flat_X = X.ravel()
+        row_offset = np.repeat(np.arange(n_rows, dtype=np.intp) * n_features, len(roots))
+        nodes = np.tile(roots, n_rows)
+        for _ in range(self.max_depth):
+            values = flat_X.take(row_offset + self.split_feature.take(nodes))
+            nodes = self.child.take(nodes) + (values > self.threshold.take(nodes))
+        return self.leaf_value.take(nodes).reshape(n_rows, len(roots)).sum(axis=1)
+
+    def predict(self, features, num_trees=None, chunk_rows=PREDICT_CHUNK_ROWS) -> np.ndarray:
+        """
+        Predicts power for raw feature rows, optionally using only the first
+        `num_trees` trees. Rows are evaluated `chunk_rows` at a time, which
+        bounds the (row, tree) cursor arrays regardless of the batch size.
+        """
+        X = self._as_matrix(features)
+        roots = self.tree_roots if num_trees is None else self.tree_roots[:num_trees]
+        preds = np.empty(X.shape[0], dtype=np.float64)
+        for start in range(0, X.shape[0], chunk_rows):
+            preds[start:start + chunk_rows] = self._predict_chunk(X[start:start + chunk_rows], roots)
+        return preds + self.bias
+
+    def to_arrays(self) -> dict:
+        return {
+            "feature_names": np.asarray(self.feature_names),
+            "split_feature": self.split_feature,
+            "threshold": self.threshold,
+            "child": self.child,
+            "leaf_value": self.leaf_value,
+            "tree_roots": self.tree_roots,
+            "max_depth": np.asarray(self.max_depth),
+            "missing_fill": self.missing_fill,
+            "bias": np.asarray(self.bias),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays) -> "CompiledModel":
+        return cls(
+            feature_names=arrays["feature_names"],
+            split_feature=arrays["split_feature"],
+            threshold=arrays["threshold"],
+            child=arrays["child"],
+            leaf_value=arrays["leaf_value"],
+            tree_roots=arrays["tree_roots"],
+            max_depth=arrays["max_depth"],
+            missing_fill=arrays["missing_fill"],
+            bias=arrays["bias"],
+        )
+
+    def save(self, directory, metadata=None) -> dict:
+        return write_artifact(directory, self.to_arrays(), metadata)
+
+    @classmethod
+    def load(cls, directory, verify=True):
+        """Maps a saved model read-only; returns `(model, manifest)`."""
+        arrays, manifest = open_artifact(directory, verify=verify)
+        return cls.from_arrays(arrays), manifest
+
+
+def _scaler_params(scaler, n_features):
+    if type(scaler).__name__ != "StandardScaler":
+        raise ValueError(f"Cannot compile transformer of type {type(scaler).__name__}")
+    # mean_ is fitted even with with_mean=False, but transform ignores it
+    mean = getattr(scaler, "mean_", None) if scaler.with_mean else None
+    scale = getattr(scaler, "scale_", None) if scaler.with_std else None
+    mean = np.zeros(n_features) if mean is None else np.asarray(mean, dtype=np.float64)
+    scale = np.ones(n_features) if scale is None else np.asarray(scale, dtype=np.float64)
+    return mean, scale
+
+
+def compile_model(model, preprocessor, output_transformer) -> CompiledModel:
+    booster = model.booster_ if hasattr(model, "booster_") else model
+    dump = booster.dump_model()
+
+    objective = dump["objective"].split()[0]
+    if objective not in IDENTITY_OBJECTIVES or "sqrt" in dump["objective"]:
+        raise ValueError(f"Cannot compile objective '{dump['objective']}'")
+    if dump["num_tree_per_iteration"] != 1:
+        raise ValueError("Only single-output regression models can be compiled")
+
+    feature_names = list(getattr(preprocessor, "feature_names_in_", dump["feature_names"]))
+    in_mean, in_scale = _scaler_params(preprocessor, len(feature_names))
+    out_mean, out_scale = _scaler_params(output_transformer, 1)
+    leaf_scale = out_scale[0] / len(dump["tree_info"]) if dump["average_output"] else out_scale[0]
+
+    split_feature, threshold, child, leaf_value = [], [], [], []
+    tree_roots = []
+    max_depth = 0
+
+    def allocate(count):
+        start = len(split_feature)
+        for index in range(start, start + count):
+            split_feature.append(0)
+            threshold.append(np.inf)
+            child.append(index)
+            leaf_value.append(0.0)
+        return start
+
+    def fill_node(index, node, depth):
+        nonlocal max_depth
+        if "split_index" not in node:
+            leaf_value[index] = node["leaf_value"] * leaf_scale
+            max_depth = max(max_depth, depth)
+            return
+
+        if node["decision_type"] != "<=" or node["missing_type"] != "None":
+            raise ValueError(
+                f"Cannot compile split with decision_type={node['decision_type']} "
+                f"missing_type={node['missing_type']}"
+            )
+        feature = node["split_feature"]
+        split_feature[index] = feature
+        # (x - mean) / scale <= t  <=>  x <= t * scale + mean
+        threshold[index] = node["threshold"] * in_scale[feature] + in_mean[feature]
+        child[index] = allocate(2)
+        fill_node(child[index], node["left_child"], depth + 1)
+        fill_node(child[index] + 1, node["right_child"], depth + 1)
+
+    for tree in dump["tree_info"]:
+        root = allocate(1)
+        tree_roots.append(root)
+        fill_node(root, tree["tree_structure"], 0)
+
+    return CompiledModel(
+        feature_names=feature_names,
+        split_feature=split_feature,
+        threshold=threshold,
+        child=child,
+        leaf_value=leaf_value,
+        tree_roots=tree_roots,
+        max_depth=max_depth,
+        # LightGBM maps NaN to 0 in the scaled space when missing_type is None,
+        # which is the training mean in raw units.
+        missing_fill=in_mean,
+        bias=out_mean[0],
+    )
+
+
+def verify(compiled, artifacts, features_df, rtol=1e-9, atol=1e-6) -> float:
+    """Compares the compiled model with the pickled pipeline and returns the max abs difference."""
+    transformed = artifacts.preprocessor.transform(features_df[compiled.feature_names])
+    expected = artifacts.output_transformer.inverse_transform(
+        artifacts.model.predict(transformed).reshape(-1, 1)
+    )[:, 0]
+    actual = compiled.predict(features_df)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if not np.allclose(expected, actual, rtol=rtol, atol=atol):
+        raise AssertionError(f"Compiled model deviates from the pickled pipeline (max abs diff {max_diff})")
+    return max_diff
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    from services.model_registry import ModelRegistry
+
+    artifacts = ModelRegistry(backend="pickle").get()
+    compiled = compile_model(artifacts.model, artifacts.preprocessor, artifacts.output_transformer)
+    print(f"Compiled {compiled.num_trees} trees, {len(compiled.threshold)} nodes, max depth {compiled.max_depth}")
+
+    features_df = pd.read_csv(VERIFICATION_DATA_PATH)[compiled.feature_names]
+    max_diff = verify(compiled, artifacts, features_df)
+    print(f"Verified on {len(features_df)} rows, max abs diff {max_diff:.3e}")
+
+    output_dir = os.path.join(MODEL_DIR, COMPILED_MODEL_DIR)
+    manifest = compiled.save(
+        output_dir,
+        metadata={
+            "source_version": artifacts.version,
+            "num_trees": compiled.num_trees,
+            "max_abs_diff": max_diff,
+        },
+    )
+    print(f"Saved compiled model to {output_dir} ({manifest['checksum']})")
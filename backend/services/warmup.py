@@ -0,0 +1,75 @@
+import asyncio
+import inspect
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class WarmupState:
+    """
+    Tracks the startup warmup. The process is ready once every required
+    component has warmed successfully; optional components that fail (e.g. a
+    vector store without embedding credentials) are reported as degraded but
+    do not hold back readiness.
+    """
+
+    def __init__(self):
+        self.started_at = None
+        self.finished_at = None
+        self.components = {}
+
+    @property
+    def ready(self):
+        if self.finished_at is None:
+            return False
+        return all(
+            component["status"] == "ok"
+            for component in self.components.values()
+            if component["required"]
+        )
+
+    def snapshot(self):
+        return {
+            "ready": self.ready,
+            "warmup_seconds": (
+                self.finished_at - self.started_at
+                if self.finished_at is not None
+                else None
+            ),
+            "components": self.components,
+            "degraded": [
+                name
+                for name, component in self.components.items()
+                if not component["required"] and component["status"] == "error"
+            ],
+        }
+
+
+async def run_warmup(state, steps):
+    """
+    Runs `steps`, a list of `(name, fn, required)`, in order. `fn` may be a
+    plain function (run in a worker thread) or a coroutine function.
+    """
+    state.started_at = time.perf_counter()
+    for name, _, required in steps:
+        state.components[name] = {"status": "pending", "required": required, "seconds": None}
+
+    for name, fn, required in steps:
+        component = state.components[name]
+        started = time.perf_counter()
+        try:
+            if inspect.iscoroutinefunction(fn):
+                await fn()
+            else:
+                await asyncio.to_thread(fn)
+            component["status"] = "ok"
+        except Exception as e:
+            logger.error("Warmup of %s failed: %s - %s", name, type(e).__name__, e)
+            component["status"] = "error"
+            component["error"] = str(e)
+        component["seconds"] = round(time.perf_counter() - started, 4)
+        logger.info("Warmup of %s: %s in %ss", name, component["status"], component["seconds"])
+
+    state.finished_at = time.perf_counter()
+    return state
@@ -0,0 +1,208 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Lookups are snapped to a grid of this many degrees (0.05 deg is ~5.5 km), so
+# nearby users in the same city share one cached forecast.
+WEATHER_CACHE_RESOLUTION = float(os.getenv("WEATHER_CACHE_RESOLUTION", "0.05"))
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "2048"))
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL", "3600"))
+# Open-Meteo refreshes its forecasts hourly; entries never outlive the update
+# boundary they were fetched in, whatever the TTL.
+WEATHER_UPDATE_INTERVAL = float(os.getenv("WEATHER_UPDATE_INTERVAL", "3600"))
+# Expired entries are kept this much longer and served as stale while a
+# refresh runs, or while Open-Meteo is unavailable; 0 disables stale serving.
+WEATHER_CACHE_STALE_TTL = float(os.getenv("WEATHER_CACHE_STALE_TTL", "21600"))
+# Optional on-disk tier shared by all workers on the host; empty disables it.
+WEATHER_CACHE_DIR = os.getenv("WEATHER_CACHE_DIR", "")
+
+
+class WeatherCache:
+    """
+    Two-tier cache of Open-Meteo responses keyed by grid cell. The in-memory
+    tier is an LRU; the optional disk tier stores one JSON file per key and is
+    consulted on a memory miss. Entries are fresh until the next forecast
+    update and stale for `stale_ttl` after that. Expiry uses wall-clock time
+    so disk entries stay valid across processes. `lookup`, `get` and `put`
+    are coroutines because disk reads and writes run in a worker thread.
+    """
+
+    def __init__(
+        self,
+        resolution=WEATHER_CACHE_RESOLUTION,
+        max_size=WEATHER_CACHE_SIZE,
+        ttl=WEATHER_CACHE_TTL,
+        update_interval=WEATHER_UPDATE_INTERVAL,
+        directory=WEATHER_CACHE_DIR,
+        stale_ttl=WEATHER_CACHE_STALE_TTL,
+    ):
+        self.resolution = resolution
+        self.max_size = max_size
+        self.ttl = ttl
+        self.update_interval = update_interval
+        self.directory = directory or None
+        self.stale_ttl = max(0.0, stale_ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hit_count = 0
+        self._lookup_count = 0
+
+        self.hits = {
+            tier: metrics.counter(
+                "weather_cache_hits_total",
+                "Weather lookups served from the cache.",
+                {"tier": tier},
+            )
+            for tier in ("memory", "disk")
+        }
+        self.misses = metrics.counter("weather_cache_misses_total", "Weather cache lookups that missed.")
+        self.stale_hits = metrics.counter(
+            "weather_cache_stale_served_total",
+            "Weather lookups answered with an expired entry from the stale window.",
+        )
+        self.evictions = metrics.counter("weather_cache_evictions_total", "Weather entries evicted by LRU or expiry.")
+        self.size = metrics.gauge("weather_cache_entries", "Entries currently held in the in-memory weather cache.")
+        self.hit_ratio = metrics.gauge("weather_cache_hit_ratio", "Fraction of weather lookups served from the cache.")
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @property
+    def enabled(self):
+        return self.max_size > 0 and self.ttl > 0
+
+    def cell(self, latitude, longitude):
+        """Returns the (row, column) index of the grid cell containing the point."""
+        return (
+            math.floor(latitude / self.resolution),
+            math.floor(longitude / self.resolution),
+        )
+
+    def cell_center(self, cell):
+        return tuple(round((index + 0.5) * self.resolution, 6) for index in cell)
+
+    def key(self, latitude, longitude):
+        return (self.resolution, *self.cell(latitude, longitude))
+
+    def _expires_at(self, now):
+        expires_at = now + self.ttl
+        if self.update_interval > 0:
+            next_update = (math.floor(now / self.update_interval) + 1) * self.update_interval
+            expires_at = min(expires_at, next_update)
+        return expires_at
+
+    def _path(self, key):
+        resolution, row, column = key
+        return os.path.join(self.directory, f"{resolution:g}_{row}_{column}.json")
+
+    def _record(self, hit):
+        with self._lock:
+            self._lookup_count += 1
+            self._hit_count += hit
+            self.hit_ratio.set(self._hit_count / self._lookup_count)
+
+    def _read_disk(self, key, now):
+        path = self._path(key)
+        try:
+            with open(path) as file_obj:
+                entry = json.load(file_obj)
+        except (OSError, ValueError):
+            return None
+        if entry.get("expires_at", 0) + self.stale_ttl <= now:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return entry["data"], entry["expires_at"]
+
+    def _write_disk(self, key, value, expires_at):
+        path = self._path(key)
+        # A temp file of its own per writer: workers sharing the directory may
+        # write the same cell at once, and os.replace publishes whole files only
+        tmp_path = None
+        try:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(path), suffix=".tmp")
+            with os.fdopen(fd, "w") as file_obj:
+                json.dump({"expires_at": expires_at, "data": value}, file_obj)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not write weather cache entry %s: %s", path, e)
+            if tmp_path is not None and os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def _store(self, key, value, expires_at):
+        with self._lock:
+            self._entries[key] = (value, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions.inc()
+            self.size.set(len(self._entries))
+
+    async def lookup(self, key):
+        """
+        Returns `(value, fresh)`, where `fresh` is False for an expired entry
+        still within the stale window, or None if nothing usable is cached.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                if expires_at + self.stale_ttl > now:
+                    self._entries.move_to_end(key)
+                    tier = "memory"
+                else:
+                    del self._entries[key]
+                    self.evictions.inc()
+                    self.size.set(len(self._entries))
+                    entry = None
+
+        if entry is None and self.directory:
+            entry = await asyncio.to_thread(self._read_disk, key, now)
+            if entry is not None:
+                value, expires_at = entry
+                self._store(key, value, expires_at)
+                tier = "disk"
+
+        if entry is None:
+            self.misses.inc()
+            self._record(False)
+            return None
+        fresh = expires_at > now
+        if fresh:
+            self.hits[tier].inc()
+        else:
+            self.stale_hits.inc()
+        self._record(fresh)
+        return value, fresh
+
+    async def get(self, key):
+        """Returns the cached value if it is fresh, otherwise None."""
+        entry = await self.lookup(key)
+        return entry[0] if entry is not None and entry[1] else None
+
+    async def put(self, key, value):
+        expires_at = self._expires_at(time.time())
+        self._store(key, value, expires_at)
+        if self.directory:
+            await asyncio.to_thread(self._write_disk, key, value, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size.set(0)
+
+
+weather_cache = WeatherCache()
@@ -0,0 +1,158 @@
+import logging
+import os
+import time
+
+import httpx
+
+from services import metrics
+
+logger = logging.getLogger(__name__)
+
+# Connection pool for calls to the Open-Meteo API. One client lives for the
+# whole application so DNS, TCP and TLS setup are paid once per connection
+# rather than once per request.
+WEATHER_HTTP_MAX_CONNECTIONS = int(os.getenv("WEATHER_HTTP_MAX_CONNECTIONS", "20"))
+WEATHER_HTTP_MAX_KEEPALIVE = int(os.getenv("WEATHER_HTTP_MAX_KEEPALIVE", "10"))
+WEATHER_HTTP_KEEPALIVE_EXPIRY = float(os.getenv("WEATHER_HTTP_KEEPALIVE_EXPIRY", "30"))
+WEATHER_HTTP_CONNECT_TIMEOUT = float(os.getenv("WEATHER_HTTP_CONNECT_TIMEOUT", "3"))
+WEATHER_HTTP_READ_TIMEOUT = float(os.getenv("WEATHER_HTTP_READ_TIMEOUT", "10"))
+WEATHER_HTTP_POOL_TIMEOUT = float(os.getenv("WEATHER_HTTP_POOL_TIMEOUT", "5"))
+# "auto" enables HTTP/2 when `h2` (httpx[http2], in the requirements) is installed
+WEATHER_HTTP2 = os.getenv("WEATHER_HTTP2", "auto").lower()
+
+
+def _http2_enabled(setting):
+    if setting in ("0", "false", "no", "off"):
+        return False
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        if setting != "auto":
+            logger.warning("WEATHER_HTTP2=%s but the h2 package is not installed; using HTTP/1.1", setting)
+        return False
+    return True
+
+
+class WeatherClient:
+    """
+    Owns the shared `httpx.AsyncClient` used for weather lookups. `start` and
+    `aclose` are called from the FastAPI lifespan; `get` starts the client
+    lazily so scripts and tests that skip the lifespan still work.
+    """
+
+    def __init__(
+        self,
+        max_connections=WEATHER_HTTP_MAX_CONNECTIONS,
+        max_keepalive=WEATHER_HTTP_MAX_KEEPALIVE,
+        keepalive_expiry=WEATHER_HTTP_KEEPALIVE_EXPIRY,
+        http2=WEATHER_HTTP2,
+        transport=None,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.timeout = httpx.Timeout(
+            connect=WEATHER_HTTP_CONNECT_TIMEOUT,
+            read=WEATHER_HTTP_READ_TIMEOUT,
+            write=WEATHER_HTTP_READ_TIMEOUT,
+            pool=WEATHER_HTTP_POOL_TIMEOUT,
+        )
+        self.http2 = _http2_enabled(http2)
+        self.transport = transport
+        self._client = None
+        self._in_flight = 0
+
+        self.max_connections = metrics.gauge(
+            "weather_http_pool_max_connections",
+            "Configured connection limit of the weather HTTP pool.",
+        )
+        self.max_connections.set(max_connections)
+        self.in_flight = metrics.gauge(
+            "weather_http_in_flight",
+            "Weather API requests currently in flight.",
+        )
+        self.connections = {
+            state: metrics.gauge(
+                "weather_http_pool_connections",
+                "Connections held by the weather HTTP pool.",
+                {"state": state},
+            )
+            for state in ("active", "idle")
+        }
+        self.request_time = metrics.histogram(
+            "weather_http_request_seconds",
+            "Latency of weather API requests, including pool waits.",
+        )
+        self.errors = metrics.counter(
+            "weather_http_errors_total",
+            "Weather API requests that failed before returning a response.",
+        )
+
+    @property
+    def started(self):
+        return self._client is not None
+
+    def start(self):
+        if self._client is not None:
+            return self._client
+        self._client = httpx.AsyncClient(
+            limits=self.limits,
+            timeout=self.timeout,
+            http2=self.http2,
+            transport=self.transport,
+        )
+        logger.info(
+            "Weather HTTP client started (http2=%s, max_connections=%s)",
+            self.http2,
+            self.limits.max_connections,
+        )
+        return self._client
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._record_pool()
+
+    def _record_pool(self):
+        # httpx does not expose pool statistics, so read them from httpcore
+        # when available; custom transports simply report nothing.
+        pool = getattr(getattr(self._client, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", ()))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        self.connections["active"].set(len(connections) - idle)
+        self.connections["idle"].set(idle)
+
+    async def warm(self, url):
+        """
+        Opens a pooled connection to `url`'s host with a HEAD request so the
+        first real lookup skips DNS, TCP and TLS setup. Any status counts as
+        success; only transport errors raise.
+        """
+        client = self.start()
+        try:
+            response = await client.head(url)
+        finally:
+            self._record_pool()
+        return response.status_code
+
+    async def get(self, url, **kwargs) -> httpx.Response:
+        client = self.start()
+        self._in_flight += 1
+        self.in_flight.set(self._in_flight)
+        started = time.perf_counter()
+        try:
+            return await client.get(url, **kwargs)
+        except httpx.HTTPError:
+            self.errors.inc()
+            raise
+        finally:
+            self._in_flight -= 1
+            self.in_flight.set(self._in_flight)
+            self.request_time.observe(time.perf_counter() - started)
+            self._record_pool()
+
+
+weather_client = WeatherClient()
@@ -0,0 +1,169 @@
+import asyncio
+import os
+from functools import partial
+
+import httpx
+
+from services.circuit_breaker import CircuitBreaker
+from services.forecast_decoder import loads
+from services.hourly_forecast import HOURLY_VARIABLES
+from services.single_flight import SingleFlight
+from services.weather_cache import weather_cache
+from services.weather_client import weather_client
+
+# Point this at a stand-in server (see benchmarks/open_meteo_stub.py) to run offline
+OPEN_METEO_BASE_URL = os.getenv("OPEN_METEO_BASE_URL", "https://api.open-meteo.com").rstrip("/")
+OPEN_METEO_FORECAST_URL = f"{OPEN_METEO_BASE_URL}/v1/forecast"
+# Coordinates per multi-location Open-Meteo request; larger batches are split
+# into chunks that are fetched concurrently.
+OPEN_METEO_BATCH_SIZE = int(os.getenv("OPEN_METEO_BATCH_SIZE", "50"))
+# Consecutive upstream failures that open the breaker, and how long it stays
+# open before a single trial request is let through.
+WEATHER_BREAKER_FAILURES = int(os.getenv("WEATHER_BREAKER_FAILURES", "5"))
+WEATHER_BREAKER_RESET_SECONDS = float(os.getenv("WEATHER_BREAKER_RESET_SECONDS", "30"))
+
+FORECAST_QUERY = (
+    "&hourly=" + ",".join(HOURLY_VARIABLES)
+    + "&current=temperature_2m,wind_speed_10m,wind_direction_10m"
+    "&daily=sunshine_duration&timezone=UTC"
+)
+
+# Concurrent lookups for the same grid cell share one upstream fetch
+weather_flight = SingleFlight("weather")
+# While Open-Meteo is failing, requests fail fast (or are served stale) instead
+# of each waiting out the timeouts.
+weather_breaker = CircuitBreaker(
+    "weather",
+    failure_threshold=WEATHER_BREAKER_FAILURES,
+    reset_timeout=WEATHER_BREAKER_RESET_SECONDS,
+)
+
+
+def is_upstream_failure(exc):
+    # Timeouts, connection errors, 5xx and rate limiting mean Open-Meteo is
+    # struggling; other 4xx responses are the request's fault.
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500 or exc.response.status_code == 429
+    return isinstance(exc, httpx.TransportError)
+
+
+async def _get_json(url):
+    async def request():
+        resp = await weather_client.get(url)
+        resp.raise_for_status()
+        return loads(resp.content)
+
+    return await weather_breaker.call(request, is_upstream_failure)
+
+
+async def warm_connection():
+    # Bypasses the breaker: a failed warmup says nothing about live traffic
+    await weather_client.warm(OPEN_METEO_FORECAST_URL)
+
+
+async def _fetch(latitude, longitude) -> dict:
+    url = f"{OPEN_METEO_FORECAST_URL}?latitude={latitude}&longitude={longitude}" + FORECAST_QUERY
+    return await _get_json(url)
+
+
+async def _fetch_chunk(coordinates) -> list:
+    # Open-Meteo takes comma-separated coordinate lists and answers with one
+    # object per location, or a bare object for a single location.
+    latitudes = ",".join(str(latitude) for latitude, _ in coordinates)
+    longitudes = ",".join(str(longitude) for _, longitude in coordinates)
+    url = f"{OPEN_METEO_FORECAST_URL}?latitude={latitudes}&longitude={longitudes}" + FORECAST_QUERY
+    data = await _get_json(url)
+    results = data if isinstance(data, list) else [data]
+    if len(results) != len(coordinates):
+        raise ValueError(f"Weather API returned {len(results)} forecasts for {len(coordinates)} locations")
+    return results
+
+
+async def _fetch_many(coordinates) -> list:
+    chunks = [
+        coordinates[start:start + OPEN_METEO_BATCH_SIZE]
+        for start in range(0, len(coordinates), OPEN_METEO_BATCH_SIZE)
+    ]
+    results = await asyncio.gather(*[_fetch_chunk(chunk) for chunk in chunks])
+    return [data for chunk in results for data in chunk]
+
+
+async def _fetch_cell(key, cell):
+    data = await _fetch(*weather_cache.cell_center(cell))
+    await weather_cache.put(key, data)
+    return data
+
+
+async def _from_bulk(bulk, index, key):
+    data = (await bulk)[index]
+    await weather_cache.put(key, data)
+    return data
+
+
+def _start_fetches(cells):
+    """
+    Starts a fetch for each `key -> cell` that is not already in flight and
+    returns the tasks in `cells` order. New cells share multi-location requests.
+    """
+    new = [key for key in cells if key not in weather_flight]
+    bulk = asyncio.ensure_future(_fetch_many([weather_cache.cell_center(cells[key]) for key in new])) if new else None
+    index = {key: i for i, key in enumerate(new)}
+    return [
+        weather_flight.start(
+            key,
+            partial(_from_bulk, bulk, index[key], key) if key in index else partial(_fetch_cell, key, cell),
+        )
+        for key, cell in cells.items()
+    ]
+
+
+async def fetch_forecast(latitude, longitude, use_cache=True) -> dict:
+    """
+    Returns the Open-Meteo forecast payload for a location. Cached lookups are
+    fetched for the centre of the grid cell, so every point in the cell gets
+    the same forecast whether or not it was served from the cache. A stale
+    entry is returned immediately while the cell is refreshed in the background.
+    """
+    if not (use_cache and weather_cache.enabled):
+        return await _fetch(latitude, longitude)
+
+    key = weather_cache.key(latitude, longitude)
+    fetch = partial(_fetch_cell, key, weather_cache.cell(latitude, longitude))
+    entry = await weather_cache.lookup(key)
+    if entry is None:
+        return await weather_flight.do(key, fetch)
+    data, fresh = entry
+    if not fresh:
+        weather_flight.start(key, fetch)
+    return data
+
+
+async def fetch_forecasts(locations, use_cache=True) -> list:
+    """
+    Returns one forecast payload per `(latitude, longitude)` in `locations`.
+    Cache misses are fetched with multi-location requests, each grid cell
+    once; cells already being fetched by another request are joined. Stale
+    entries are returned as they are and refreshed in the background.
+    """
+    if not (use_cache and weather_cache.enabled):
+        return await _fetch_many(list(locations))
+
+    keys = [weather_cache.key(latitude, longitude) for latitude, longitude in locations]
+    cells = {key: weather_cache.cell(latitude, longitude) for key, (latitude, longitude) in zip(keys, locations)}
+    entries = await asyncio.gather(*[weather_cache.lookup(key) for key in cells])
+    results = {}
+    missing = {}
+    stale = {}
+    for (key, cell), entry in zip(cells.items(), entries):
+        if entry is None:
+            missing[key] = cell
+            continue
+        results[key], fresh = entry
+        if not fresh:
+            stale[key] = cell
+
+    if missing or stale:
+        tasks = _start_fetches({**missing, **stale})
+        fetched = await asyncio.gather(*[asyncio.shield(task) for task in tasks[:len(missing)]])
+        results.update(zip(missing, fetched))
+    return [results[key] for key in keys]
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import the backend packages (services, models, routers) the way
+# server.py does, from the backend directory.
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
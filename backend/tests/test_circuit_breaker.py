@@ -0,0 +1,129 @@
+import asyncio
+
+import pytest
+
+import services.circuit_breaker as circuit_breaker_module
+from services.circuit_breaker import CircuitBreaker, CircuitOpenError
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(circuit_breaker_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+async def _ok():
+    return "ok"
+
+
+async def _fail():
+    raise ConnectionError("upstream down")
+
+
+def _call(breaker, fn, is_failure=lambda exc: True):
+    return asyncio.run(breaker.call(fn, is_failure))
+
+
+def _open(breaker):
+    for _ in range(breaker.failure_threshold):
+        with pytest.raises(ConnectionError):
+            _call(breaker, _fail)
+    assert breaker.state == "open"
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=10)
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            _call(breaker, _fail)
+    assert _call(breaker, _ok) == "ok"
+    assert breaker.state == "closed"
+
+    _open(breaker)
+    with pytest.raises(CircuitOpenError):
+        _call(breaker, _ok)
+
+
+def test_ignored_errors_do_not_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+    with pytest.raises(ConnectionError):
+        _call(breaker, _fail, is_failure=lambda exc: False)
+    assert breaker.state == "closed"
+
+
+def test_half_open_trial_success_closes(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10)
+    _open(breaker)
+
+    clock[0] += 9.9
+    with pytest.raises(CircuitOpenError):
+        _call(breaker, _ok)
+
+    clock[0] += 0.1
+    assert _call(breaker, _ok) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_half_open_trial_failure_reopens(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=10)
+    _open(breaker)
+
+    clock[0] += 10
+    with pytest.raises(ConnectionError):
+        _call(breaker, _fail)
+    assert breaker.state == "open"
+    # The reset timeout starts over from the failed trial
+    clock[0] += 5
+    with pytest.raises(CircuitOpenError):
+        _call(breaker, _ok)
+
+
+def test_half_open_admits_a_single_trial(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+    _open(breaker)
+    clock[0] += 10
+    release = None
+
+    async def trial():
+        await release.wait()
+        return "trial"
+
+    async def main():
+        nonlocal release
+        release = asyncio.Event()
+        first = asyncio.ensure_future(breaker.call(trial))
+        await asyncio.sleep(0)
+        assert breaker.state == "half_open"
+        with pytest.raises(CircuitOpenError):
+            await breaker.call(_ok)
+        release.set()
+        return await first
+
+    assert asyncio.run(main()) == "trial"
+    assert breaker.state == "closed"
+
+
+def test_cancelled_trial_frees_the_slot(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+    _open(breaker)
+    clock[0] += 10
+
+    async def main():
+        first = asyncio.ensure_future(breaker.call(asyncio.Event().wait))
+        await asyncio.sleep(0)
+        first.cancel()
+        await asyncio.gather(first, return_exceptions=True)
+        return await breaker.call(_ok)
+
+    assert asyncio.run(main()) == "ok"
+    assert breaker.state == "closed"
+
+
+def test_rejection_reports_time_until_the_trial(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=10)
+    _open(breaker)
+    clock[0] += 4
+    with pytest.raises(CircuitOpenError) as excinfo:
+        _call(breaker, _ok)
+    assert excinfo.value.retry_after == pytest.approx(6)
@@ -0,0 +1,36 @@
+import itertools
+
+import numpy as np
+import pytest
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import RobustScaler, StandardScaler
+
+from services.feature_transform import fuse_transformer
+
+
+@pytest.fixture
+def X():
+    rng = np.random.default_rng(0)
+    return rng.normal(loc=[5.0, -3.0, 100.0], scale=[2.0, 0.5, 30.0], size=(200, 3))
+
+
+@pytest.mark.parametrize("with_mean,with_std", list(itertools.product([True, False], repeat=2)))
+def test_standard_scaler_matches_sklearn(X, with_mean, with_std):
+    scaler = StandardScaler(with_mean=with_mean, with_std=with_std).fit(X)
+    fused = fuse_transformer(scaler)
+    np.testing.assert_allclose(fused.apply(X), scaler.transform(X), rtol=1e-12, atol=1e-12)
+    np.testing.assert_allclose(fused.invert(scaler.transform(X)), X, rtol=1e-12, atol=1e-9)
+
+
+@pytest.mark.parametrize("with_centering,with_scaling", list(itertools.product([True, False], repeat=2)))
+def test_robust_scaler_matches_sklearn(X, with_centering, with_scaling):
+    scaler = RobustScaler(with_centering=with_centering, with_scaling=with_scaling).fit(X)
+    np.testing.assert_allclose(fuse_transformer(scaler).apply(X), scaler.transform(X), rtol=1e-12, atol=1e-12)
+
+
+def test_pipeline_of_scalers_matches_sklearn(X):
+    pipeline = Pipeline([
+        ("center", StandardScaler(with_std=False)),
+        ("scale", StandardScaler(with_mean=False)),
+    ]).fit(X)
+    np.testing.assert_allclose(fuse_transformer(pipeline).apply(X), pipeline.transform(X), rtol=1e-12, atol=1e-12)
@@ -0,0 +1,110 @@
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+import services.forecast_grid as forecast_grid_module
+from services.forecast_grid import ForecastGrid, GridSnapshot
+
+TIMES = ["2024-06-01T06:00", "2024-06-01T07:00"]
+
+
+@pytest.fixture(autouse=True)
+def model_version(monkeypatch):
+    monkeypatch.setattr(forecast_grid_module, "engine", SimpleNamespace(model_version="v1"))
+
+
+def _grid(interpolation="bilinear", fetched_at=None):
+    # Node (i, j) holds power 10 * i + j in every hour, and the same in feature column 0
+    latitudes = np.array([10.0, 11.0, 12.0])
+    longitudes = np.array([70.0, 71.0])
+    values = 10 * np.arange(3)[:, None] + np.arange(2)[None, :]
+    power = np.repeat(values[:, :, None], len(TIMES), axis=2).astype(np.float32)
+    features = np.zeros((3, 2, len(TIMES), 4), dtype=np.float32)
+    features[..., 0] = power
+    grid = ForecastGrid(enabled=True, bounds=(10, 12, 70, 71), resolution=1.0, interpolation=interpolation)
+    grid._install(
+        GridSnapshot(
+            latitudes=latitudes,
+            longitudes=longitudes,
+            times=TIMES,
+            features=features,
+            power=power,
+            sunshine=values.astype(np.float32),
+            feature_names=("power", "zenith", "azimuth", "angle_of_incidence"),
+            model_version="v1",
+            fetched_at=time.time() if fetched_at is None else fetched_at,
+        )
+    )
+    return grid
+
+
+def test_bilinear_interpolates_the_surrounding_nodes():
+    forecast = _grid().lookup(10.25, 70.5)
+    # 10 * 0.25 + 1 * 0.5
+    np.testing.assert_allclose(forecast.power, [3.0, 3.0])
+    np.testing.assert_allclose(forecast.features[:, 0], [3.0, 3.0])
+    assert forecast.data["daily"]["sunshine_duration"] == [pytest.approx(3.0)]
+
+
+def test_bilinear_weights_sum_to_one():
+    grid = _grid()
+    for latitude, longitude in [(10.0, 70.0), (11.7, 70.2), (12.0, 71.0)]:
+        weights = grid._weights(grid.snapshot, latitude, longitude)
+        assert sum(weight for _, _, weight in weights) == pytest.approx(1.0)
+
+
+def test_nodes_and_upper_edge_are_exact():
+    grid = _grid()
+    np.testing.assert_allclose(grid.lookup(11.0, 71.0).power, [11.0, 11.0])
+    np.testing.assert_allclose(grid.lookup(12.0, 71.0).power, [21.0, 21.0])
+
+
+def test_nearest_picks_the_closest_node():
+    forecast = _grid("nearest").lookup(11.6, 70.4)
+    np.testing.assert_allclose(forecast.power, [20.0, 20.0])
+
+
+def test_points_outside_the_grid_miss():
+    grid = _grid()
+    assert grid.lookup(9.9, 70.5) is None
+    assert grid.lookup(11.0, 71.1) is None
+
+
+def test_old_snapshot_is_not_served():
+    grid = _grid(fetched_at=time.time() - 2 * forecast_grid_module.FORECAST_GRID_MAX_AGE)
+    assert grid.lookup(11.0, 70.5) is None
+
+
+def test_custom_panel_needs_rescoring():
+    forecast = _grid().lookup(10.25, 70.5, tilt=10.0, panel_azimuth=90.0)
+    assert forecast.power is None
+    np.testing.assert_allclose(forecast.features[:, 0], [3.0, 3.0])
+
+
+def test_one_worker_refreshes_a_shared_directory(tmp_path):
+    if forecast_grid_module.fcntl is None:
+        pytest.skip("refresh election needs fcntl")
+    leader = ForecastGrid(enabled=True, directory=str(tmp_path))
+    follower = ForecastGrid(enabled=True, directory=str(tmp_path))
+    assert leader._lead()
+    assert not follower._lead()
+    leader._release()
+    assert follower._lead()
+
+
+def test_follower_reloads_only_a_changed_grid(tmp_path):
+    writer = _grid()
+    writer.directory = str(tmp_path)
+    writer.save(writer.snapshot)
+
+    follower = ForecastGrid(enabled=True, directory=str(tmp_path))
+    first = follower.load()
+    np.testing.assert_allclose(first.power, writer.snapshot.power)
+    assert follower.load() is first
+
+    newer = _grid()
+    newer.snapshot.power[...] += 1
+    writer.save(newer.snapshot)
+    np.testing.assert_allclose(follower.load().power, newer.snapshot.power)
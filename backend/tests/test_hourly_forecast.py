@@ -0,0 +1,71 @@
+import calendar
+
+import numpy as np
+
+from models.requests import PowerPredictionFeatures
+from services.hourly_forecast import (
+    HOURLY_VARIABLES,
+    current_hour_index,
+    hourly_feature_matrix,
+    site_feature_matrices,
+)
+
+TIMES = [f"2024-06-01T{hour:02d}:00" for hour in range(24)]
+
+
+def _at(text):
+    return calendar.timegm((2024, 6, 1, *map(int, text.split(":")), 0))
+
+
+def test_current_hour_comes_from_the_wall_clock():
+    # A stale payload still reports the hour it was fetched in
+    data = {"current": {"time": "2024-06-01T03:00"}, "utc_offset_seconds": 0}
+    assert current_hour_index(data, TIMES, now=_at("09:45")) == 9
+
+
+def test_current_hour_uses_the_payload_timezone():
+    data = {"utc_offset_seconds": 19800}
+    assert current_hour_index(data, TIMES, now=_at("09:45")) == 15
+
+
+def test_hour_outside_the_series_falls_back_to_the_first():
+    assert current_hour_index({}, TIMES, now=_at("09:45") + 86400) == 0
+    assert current_hour_index({}, [], now=_at("09:45")) == 0
+
+
+def _payload(start_hour, hours, seed, drop=(), holes=False):
+    rng = np.random.default_rng(seed)
+    hourly = {"time": [f"2024-06-{1 + (start_hour + hour) // 24:02d}T{(start_hour + hour) % 24:02d}:00" for hour in range(hours)]}
+    for variable in HOURLY_VARIABLES:
+        if variable in drop:
+            continue
+        values = rng.uniform(0, 900, hours)
+        if holes:
+            values[rng.random(hours) < 0.2] = np.nan
+        hourly[variable] = [None if np.isnan(value) else float(value) for value in values]
+    return {"hourly": hourly}
+
+
+def test_site_feature_matrices_match_per_site_build():
+    feature_names = list(PowerPredictionFeatures.model_fields)
+    payloads = [
+        _payload(0, 48, 0),
+        _payload(0, 48, 1, drop=HOURLY_VARIABLES[:3]),
+        _payload(0, 48, 2, holes=True),
+        _payload(6, 24, 3),
+        _payload(0, 0, 4),
+    ]
+    sites = [
+        (28.6, 77.2, None, None),
+        (12.9, 77.6, 20.0, None),
+        (19.1, 72.9, None, 150.0),
+        (22.5, 88.3, 30.0, 200.0),
+        (26.9, 75.8, None, None),
+    ]
+
+    results = site_feature_matrices(payloads, feature_names, sites)
+
+    for data, site, (times, features) in zip(payloads, sites, results):
+        expected_times, expected = hourly_feature_matrix(data, feature_names, *site)
+        assert times == expected_times
+        np.testing.assert_allclose(features, expected, rtol=1e-12, atol=1e-9)
@@ -0,0 +1,50 @@
+import os
+import time
+
+import numpy as np
+
+from services.model_artifact import STALE_BLOB_SECONDS, open_artifact, write_artifact
+
+
+def _blobs(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith("arrays-"))
+
+
+def test_superseded_blob_survives_until_it_is_stale(tmp_path):
+    first = write_artifact(tmp_path, {"values": np.arange(4)})
+    second = write_artifact(tmp_path, {"values": np.arange(5)})
+    # Another worker may still be about to open the first blob
+    assert _blobs(tmp_path) == sorted([first["blob"], second["blob"]])
+
+    old = time.time() - 2 * STALE_BLOB_SECONDS
+    os.utime(tmp_path / first["blob"], (old, old))
+    os.utime(tmp_path / second["blob"], (old, old))
+    write_artifact(tmp_path, {"values": np.arange(5)})
+    # The blob the manifest names is kept however old it is
+    assert _blobs(tmp_path) == [second["blob"]]
+
+
+def test_writes_leave_no_temp_files(tmp_path):
+    write_artifact(tmp_path, {"values": np.arange(4)})
+    assert not [name for name in os.listdir(tmp_path) if name.endswith(".tmp")]
+
+
+def test_open_follows_a_manifest_replaced_mid_read(tmp_path, monkeypatch):
+    import services.model_artifact as model_artifact
+
+    first = write_artifact(tmp_path, {"values": np.arange(4)})
+    read_manifest = model_artifact.read_manifest
+    calls = []
+
+    def racing_read(directory):
+        manifest = read_manifest(directory)
+        calls.append(manifest)
+        if len(calls) == 1:
+            # A writer publishes a new grid and removes the old blob in between
+            write_artifact(tmp_path, {"values": np.arange(5)})
+            os.remove(tmp_path / first["blob"])
+        return manifest
+
+    monkeypatch.setattr(model_artifact, "read_manifest", racing_read)
+    arrays, _ = open_artifact(tmp_path)
+    np.testing.assert_array_equal(arrays["values"], np.arange(5))
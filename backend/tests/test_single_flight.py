@@ -0,0 +1,74 @@
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*[flight.do("key", fetch) for _ in range(5)])
+        assert "key" not in flight
+        return results
+
+    assert asyncio.run(main()) == ["value"] * 5
+    assert len(calls) == 1
+
+
+def test_different_keys_run_separately():
+    async def main():
+        flight = SingleFlight("test")
+        return await asyncio.gather(flight.do("a", _value("a")), flight.do("b", _value("b")))
+
+    assert asyncio.run(main()) == ["a", "b"]
+
+
+def test_error_reaches_every_caller_and_clears_the_key():
+    calls = []
+
+    async def fail():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        raise ValueError("upstream")
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*[flight.do("key", fail) for _ in range(3)], return_exceptions=True)
+        assert "key" not in flight
+        # The next call starts afresh
+        with pytest.raises(ValueError):
+            await flight.do("key", fail)
+        return results
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, ValueError) for result in results)
+    assert len(calls) == 2
+
+
+def test_cancelled_caller_does_not_cancel_the_call():
+    async def main():
+        flight = SingleFlight("test")
+        first = asyncio.ensure_future(flight.do("key", _value("value", delay=0.02)))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(flight.do("key", _value("other")))
+        await asyncio.sleep(0)
+        first.cancel()
+        return await second
+
+    assert asyncio.run(main()) == "value"
+
+
+def _value(value, delay=0.01):
+    async def fn():
+        await asyncio.sleep(delay)
+        return value
+
+    return fn
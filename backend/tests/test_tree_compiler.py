@@ -0,0 +1,41 @@
+import itertools
+
+import numpy as np
+import pytest
+from sklearn.preprocessing import StandardScaler
+
+from services.tree_compiler import compile_model
+
+lightgbm = pytest.importorskip("lightgbm")
+
+
+@pytest.fixture(scope="module")
+def data():
+    rng = np.random.default_rng(0)
+    X = rng.normal(loc=[20.0, 900.0, 5.0], scale=[8.0, 200.0, 3.0], size=(2000, 3))
+    y = 3 * X[:, 0] + 0.01 * X[:, 1] ** 1.2 - 40 * np.sin(X[:, 2]) + rng.normal(scale=2, size=len(X))
+    return X, y
+
+
+def _fit(X, y, with_mean, with_std):
+    preprocessor = StandardScaler(with_mean=with_mean, with_std=with_std).fit(X)
+    output_transformer = StandardScaler(with_mean=with_mean, with_std=with_std).fit(y.reshape(-1, 1))
+    model = lightgbm.LGBMRegressor(n_estimators=20, num_leaves=15, verbose=-1).fit(
+        preprocessor.transform(X), output_transformer.transform(y.reshape(-1, 1))[:, 0]
+    )
+    expected = output_transformer.inverse_transform(model.predict(preprocessor.transform(X)).reshape(-1, 1))[:, 0]
+    return compile_model(model, preprocessor, output_transformer), expected
+
+
+@pytest.mark.parametrize("with_mean,with_std", list(itertools.product([True, False], repeat=2)))
+def test_compiled_model_matches_pipeline(data, with_mean, with_std):
+    X, y = data
+    compiled, expected = _fit(X, y, with_mean, with_std)
+    np.testing.assert_allclose(compiled.predict(X), expected, rtol=1e-9, atol=1e-6)
+
+
+def test_chunked_prediction_matches_single_pass(data):
+    X, y = data
+    compiled, expected = _fit(X, y, True, True)
+    np.testing.assert_allclose(compiled.predict(X, chunk_rows=7), compiled.predict(X, chunk_rows=len(X)))
+    np.testing.assert_allclose(compiled.predict(X[:0]), np.empty(0))
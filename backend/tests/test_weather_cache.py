@@ -0,0 +1,116 @@
+import asyncio
+import os
+
+import pytest
+
+import services.weather_cache as weather_cache_module
+from services.weather_cache import WeatherCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(weather_cache_module.time, "time", lambda: now[0])
+    return now
+
+
+def _cache(**kwargs):
+    options = {"ttl": 100, "update_interval": 0, "stale_ttl": 50, "directory": ""}
+    options.update(kwargs)
+    return WeatherCache(**options)
+
+
+def test_entry_is_fresh_then_stale_then_gone(clock):
+    cache = _cache()
+    key = cache.key(28.61, 77.21)
+    asyncio.run(cache.put(key, {"a": 1}))
+
+    clock[0] = 1099
+    assert asyncio.run(cache.lookup(key)) == ({"a": 1}, True)
+    assert asyncio.run(cache.get(key)) == {"a": 1}
+
+    clock[0] = 1120
+    assert asyncio.run(cache.lookup(key)) == ({"a": 1}, False)
+    assert asyncio.run(cache.get(key)) is None
+
+    clock[0] = 1150
+    assert asyncio.run(cache.lookup(key)) is None
+
+
+def test_entry_expires_at_the_forecast_update(clock):
+    cache = _cache(ttl=3600, update_interval=3600)
+    clock[0] = 3500
+    key = cache.key(28.61, 77.21)
+    asyncio.run(cache.put(key, {"a": 1}))
+
+    clock[0] = 3599
+    assert asyncio.run(cache.lookup(key)) == ({"a": 1}, True)
+    clock[0] = 3601
+    assert asyncio.run(cache.lookup(key)) == ({"a": 1}, False)
+
+
+def test_nearby_points_share_a_cell():
+    cache = _cache(resolution=0.05)
+    assert cache.key(28.611, 77.201) == cache.key(28.649, 77.249)
+    assert cache.key(28.611, 77.201) != cache.key(28.651, 77.201)
+
+
+def test_lru_evicts_oldest(clock):
+    cache = _cache(max_size=2)
+    keys = [cache.key(10.0 + i, 70.0) for i in range(3)]
+    for i, key in enumerate(keys):
+        asyncio.run(cache.put(key, i))
+    assert asyncio.run(cache.lookup(keys[0])) is None
+    assert asyncio.run(cache.lookup(keys[2])) == (2, True)
+
+
+def test_disk_tier_is_shared_between_instances(clock, tmp_path):
+    writer = _cache(directory=str(tmp_path))
+    key = writer.key(28.61, 77.21)
+    asyncio.run(writer.put(key, {"a": 1}))
+    assert os.path.exists(writer._path(key))
+
+    reader = _cache(directory=str(tmp_path))
+    clock[0] = 1050
+    assert asyncio.run(reader.lookup(key)) == ({"a": 1}, True)
+    # Promoted to memory: still served after the file is gone
+    os.remove(reader._path(key))
+    assert asyncio.run(reader.lookup(key)) == ({"a": 1}, True)
+
+
+def test_disk_entry_past_the_stale_window_is_removed(clock, tmp_path):
+    writer = _cache(directory=str(tmp_path))
+    key = writer.key(28.61, 77.21)
+    asyncio.run(writer.put(key, {"a": 1}))
+
+    reader = _cache(directory=str(tmp_path))
+    clock[0] = 1120
+    assert asyncio.run(reader.lookup(key)) == ({"a": 1}, False)
+
+    reader.clear()
+    clock[0] = 1150
+    assert asyncio.run(reader.lookup(key)) is None
+    assert not os.path.exists(reader._path(key))
+
+
+
+def test_interleaved_disk_writes_publish_whole_entries(clock, tmp_path, monkeypatch):
+    first, second = _cache(directory=str(tmp_path)), _cache(directory=str(tmp_path))
+    key = first.key(28.61, 77.21)
+    dump = weather_cache_module.json.dump
+    interrupted = []
+
+    def interrupting_dump(obj, file_obj):
+        # Another worker writes the same cell while this write is half done
+        if not interrupted:
+            interrupted.append(True)
+            file_obj.write(" " * 16)
+            file_obj.flush()
+            second._write_disk(key, {"writer": "second"}, 2000.0)
+        dump(obj, file_obj)
+
+    monkeypatch.setattr(weather_cache_module.json, "dump", interrupting_dump)
+    first._write_disk(key, {"writer": "first"}, 2000.0)
+
+    assert first._read_disk(key, 1000.0) == ({"writer": "first"}, 2000.0)
+    assert os.listdir(tmp_path) == [os.path.basename(first._path(key))]
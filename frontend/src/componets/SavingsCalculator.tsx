@@ -20,6 +20,7 @@ import calculateCarbonSavings from "../ultils/evaulate-carbon";
 const SavingsCalculator = () => {
 	const [monthlyBill, setMonthlyBill] = useState("");
 	const [pincode, setPincode] = useState("");
+	const [systemSize, setSystemSize] = useState("");
 	const [pincodeLocation, setPincodeLocation] = useState<string | null>(null);
 	const [showResults, setShowResults] = useState(false);
 	const [animateNumbers, setAnimateNumbers] = useState(false);
@@ -102,26 +103,50 @@ const SavingsCalculator = () => {
 			setMonthlyUnitsConsumed(unitsConsumed);
 
 			const backendUrl = import.meta.env.VITE_BACKEND_URL;
-			const energyResponse = await fetch(`${backendUrl}/energy_by_location`, {
-				method: "POST",
-				headers: { "Content-Type": "application/json" },
-				body: JSON.stringify({
-					latitude: coordinates.lat,
-					longitude: coordinates.lon,
-				}),
+			const location = JSON.stringify({
+				latitude: coordinates.lat,
+				longitude: coordinates.lon,
 			});
 
-			if (!energyResponse.ok) {
-				const errorData = await energyResponse.json();
-				throw new Error(
-					errorData.detail ||
-						`Energy prediction API failed: ${energyResponse.status}`
-				);
+			// With a system size, use the typical-year simulation scaled to that
+			// size; fall back to the forecast-based estimate without one or when
+			// the backend has no climatology data for the location
+			let generated: number | null = null;
+			const systemCapacityKw = parseFloat(systemSize);
+			if (systemCapacityKw > 0) {
+				const yieldResponse = await fetch(`${backendUrl}/annual_yield`, {
+					method: "POST",
+					headers: { "Content-Type": "application/json" },
+					body: JSON.stringify({
+						latitude: coordinates.lat,
+						longitude: coordinates.lon,
+						system_capacity_kw: systemCapacityKw,
+					}),
+				});
+				if (yieldResponse.ok) {
+					const yieldData = await yieldResponse.json();
+					generated = Math.round((yieldData.annual_kwh ?? 0) / 12);
+				}
 			}
 
-			const energyData = await energyResponse.json();
+			if (generated === null) {
+				const energyResponse = await fetch(`${backendUrl}/energy_by_location`, {
+					method: "POST",
+					headers: { "Content-Type": "application/json" },
+					body: location,
+				});
+
+				if (!energyResponse.ok) {
+					const errorData = await energyResponse.json();
+					throw new Error(
+						errorData.detail ||
+							`Energy prediction API failed: ${energyResponse.status}`
+					);
+				}
 
-			const generated = Math.round(energyData.energy_generated ?? 0);
+				const energyData = await energyResponse.json();
+				generated = Math.round(energyData.energy_generated ?? 0);
+			}
 			setMonthlyEnergyGenerated(generated);
 
 			const energySavedKwh = Math.min(generated, unitsConsumed);
@@ -162,6 +187,7 @@ const SavingsCalculator = () => {
 	const resetCalculator = () => {
 		setMonthlyBill("");
 		setPincode("");
+		setSystemSize("");
 		setPincodeLocation(null);
 		setShowResults(false);
 		setLoading(false);
@@ -273,6 +299,34 @@ const SavingsCalculator = () => {
 							</div>
 						</div>
 
+						<div>
+							<label
+								htmlFor="systemSize"
+								className="block text-lg font-medium text-gray-700 mb-2 ml-1"
+							>
+								System Size (kWp, optional)
+							</label>
+							<div className="mt-1 relative rounded-xl shadow-sm">
+								<div className="absolute inset-y-0 left-0 pl-5 flex items-center pointer-events-none">
+									<CloudSun className="h-6 w-6 text-blue-500" />
+								</div>
+								<input
+									type="number"
+									name="systemSize"
+									id="systemSize"
+									value={systemSize}
+									onChange={(e) => {
+										setSystemSize(e.target.value);
+										setApiError(null);
+									}}
+									className="pl-14 py-4 block w-full rounded-2xl text-lg border-gray-300 shadow-md focus:ring-blue-500 focus:border-blue-500 transition-all duration-200"
+									placeholder="e.g. 3"
+									min="0"
+									step="0.1"
+								/>
+							</div>
+						</div>
+
 						{apiError && (
 							<motion.div
 								initial={{ opacity: 0 }}